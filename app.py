@@ -6,18 +6,40 @@ Versión Mejorada con ordenamiento automático y optimizaciones de rendimiento
 import dash
 from dash import dcc, html, Input, Output, State, ALL
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
 import pytz
-import requests
+import asyncio
 from io import StringIO
+from urllib.parse import urlencode
+from html import escape as html_escape
 import re
+import csv
 import json
-from flask_caching import Cache
+import gc
+import gzip
+import tempfile
+import sqlite3
+import hashlib
+import os
+import time
+import threading
+from collections import OrderedDict
+from itertools import chain, repeat
+from concurrent.futures import ThreadPoolExecutor
+from flask import Response, request, stream_with_context
 from typing import Dict, List, Tuple, Optional
 
+try:
+    import brotli  # opcional: compresión 'br' para navegadores que la aceptan
+except ImportError:
+    brotli = None
+
 # ============================================================================
 # CONFIGURACIÓN INICIAL
 # ============================================================================
@@ -30,13 +52,6 @@ app = dash.Dash(
     suppress_callback_exceptions=True
 )
 
-# Configurar cache
-cache = Cache(app.server, config={
-    'CACHE_TYPE': 'filesystem',
-    'CACHE_DIR': 'cache-directory',
-    'CACHE_THRESHOLD': 50
-})
-
 app.title = "Dashboard Monitoreo Flota Atunera"
 server = app.server
 
@@ -44,13 +59,39 @@ server = app.server
 # CONSTANTES
 # ============================================================================
 
-BARCOS_ATUNEROS = [
-    "MILENA A", "MARIA DEL MAR", "ROSA F", "BP RICKY A", "MILAGROS A",
-    "EL MARQUEZ", "ROBERTO A", "MARIA EULOGIA", "ELIZABETH F", "GLORIA A",
-    "VIA SIMOUN", "DRENNEC", "GABRIELA A", "GURIA", "RAFA A"
-]
+# Registro de flotas (barcos, alias y marcadores); se recarga en caliente si cambia el archivo
+RUTA_REGISTRO_FLOTAS = os.environ.get(
+    'NIRSA_REGISTRO_FLOTAS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flota.json')
+)
+INTERVALO_REVISION_REGISTRO = 5  # segundos entre revisiones del archivo
+MIN_LARGO_PREFIJO = 4
+# Esquema de ingesta: columna estándar -> nombres alternativos en el sheet
+MAPEO_COLUMNAS = {
+    'Fecha': ['Fecha', 'FECHA', 'fecha', 'FECHA Y HORA', 'Fecha y hora'],
+    'Area': ['Área', 'Area', 'ÁREA', 'AREA', 'Área de Alerta', 'AREA DE ALERTA'],
+    'Activo': ['Activo', 'ACTIVO', 'activo', 'Equipo', 'EQUIPO', 'equipo'],
+    'Alerta': ['Alerta', 'ALERTA', 'alerta', 'Tipo de Alerta', 'TIPO DE ALERTA', 'Tipo de alerta']
+}
+
+MIN_PUNTAJE_SUGERENCIA = 0.5
+TOP_SIN_IDENTIFICAR = 10
+
+SHEET_ID = "1kt9igSja2pUTTwzVvWGmGptErH3FUviSb1bymsOx0iU"  # fuente por defecto si el registro no define "fuentes"
+
+# Fuentes de alertas (sheets/CSV) descargadas en paralelo
+TIMEOUT_FUENTE = 30  # segundos por intento
+REINTENTOS_FUENTE = 2
+BACKOFF_BASE_FUENTE = 2  # segundos; se duplica en cada reintento
+BACKOFF_MAX_FUENTE = 300  # segundos máximos sin reintentar una fuente que falla seguido
+INTERVALO_DESCARGA = 60  # segundos mínimos entre descargas de una misma fuente
 
-SHEET_ID = "1kt9igSja2pUTTwzVvWGmGptErH3FUviSb1bymsOx0iU"
+# Paleta cualitativa Set3 de plotly, precalculada para no importar plotly.express al arrancar
+PALETA_ALERTAS = [
+    'rgb(141,211,199)', 'rgb(255,255,179)', 'rgb(190,186,218)', 'rgb(251,128,114)',
+    'rgb(128,177,211)', 'rgb(253,180,98)', 'rgb(179,222,105)', 'rgb(252,205,229)',
+    'rgb(217,217,217)', 'rgb(188,128,189)', 'rgb(204,235,197)', 'rgb(255,237,111)'
+]
 
 COLORES_FRANJAS = {
     'verde': 'rgba(46, 204, 113, 0.8)',
@@ -61,6 +102,116 @@ COLORES_FRANJAS = {
 
 ZONA_HORARIA = pytz.timezone('America/Guayaquil')
 
+# Modo replay sin red: NIRSA_REPLAY=sintetico o ruta a un CSV (o carpeta de CSVs) grabado del sheet
+MODO_REPLAY = os.environ.get('NIRSA_REPLAY') or None
+VELOCIDAD_REPLAY = float(os.environ.get('NIRSA_REPLAY_VELOCIDAD', '60'))  # segundos virtuales por segundo real
+INICIO_REPLAY = os.environ.get('NIRSA_REPLAY_INICIO')  # ISO; por defecto la primera alerta grabada o ahora
+SEMILLA_REPLAY = int(os.environ.get('NIRSA_REPLAY_SEMILLA', '7'))
+TASA_SINTETICA = (0.3, 2.5)  # rango de alertas/hora por barco
+PROBABILIDAD_RAFAGA = 0.02  # por barco y hora virtual
+ALERTAS_RAFAGA = 8  # alertas extra (media) en una ráfaga
+EQUIPOS_SINTETICOS = ['MOTOR PRINCIPAL', 'GENERADOR 1', 'GENERADOR 2', 'BOMBA HIDRÁULICA', 'COMPRESOR RSW']
+ALERTAS_SINTETICAS = ['Vibración alta', 'Temperatura alta', 'Desbalance']
+
+# En replay los datos locales van a replay/ para no mezclarse con los reales
+DIRECTORIO_DATOS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'replay' if MODO_REPLAY else ''
+)
+
+# Almacén local de alertas (SQLite en modo WAL)
+RUTA_ALERTAS_DB = os.environ.get(
+    'NIRSA_ALERTAS_DB',
+    os.path.join(DIRECTORIO_DATOS, 'alertas.db')
+)
+
+# Histórico Parquet particionado por día (fecha=YYYY-MM-DD)
+RUTA_HISTORICO = os.environ.get(
+    'NIRSA_HISTORICO_DIR',
+    os.path.join(DIRECTORIO_DATOS, 'historico')
+)
+INTERVALO_COMPACTACION = 600  # segundos
+VIGENCIA_RECLAMO_COMPACTACION = 600  # segundos; un reclamo más viejo es de un proceso que murió
+
+# Cache en memoria (LRU por tamaño, claves por versión de datos) y nivel Arrow en disco
+LIMITE_CACHE_MB = float(os.environ.get('NIRSA_CACHE_MAX_MB', '256'))
+RUTA_CACHE_DISCO = os.environ.get('NIRSA_CACHE_DIR', os.path.join(DIRECTORIO_DATOS, 'cache-arrow'))  # '' lo desactiva
+MAX_ARCHIVOS_CACHE_DISCO = 20
+
+# Reportes de cambio de turno (hora local, ZONA_HORARIA)
+HORAS_CAMBIO_TURNO = (6, 14, 22)
+TOP_EQUIPOS_REPORTE = 5
+VENTANA_NUEVAS_TURNO = timedelta(hours=24)  # equipo/alerta sin registros en esta ventana previa = nueva
+INTERVALO_PROGRAMADOR_TURNOS = 30  # segundos entre revisiones del programador
+RUTA_REPORTES = os.environ.get('NIRSA_REPORTES_DIR', os.path.join(DIRECTORIO_DATOS, 'reportes'))
+
+# Detección de alertas nuevas entre actualizaciones (por hash de fila)
+TOLERANCIA_LLEGADA = timedelta(minutes=15)  # filas que llegan tarde al sheet
+MAX_EVENTOS_NUEVOS = 200
+MAX_EVENTOS_CACHE = 50  # eventos por versión de datos en memoria
+VIGENCIA_EVENTO = timedelta(minutes=5)  # pantallas nuevas reciben el último evento si es reciente
+RETENCION_EVENTOS = timedelta(days=7)
+
+# API JSON de solo lectura
+EDAD_MAXIMA_SNAPSHOT = 60  # segundos; coincide con el intervalo de descarga de las fuentes
+MAX_ALERTAS_API = 5000
+
+# Compresión de respuestas de callbacks y API (brotli si está instalado, si no gzip)
+RUTAS_COMPRIMIBLES = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies', '/api/')
+MIN_BYTES_COMPRESION = 1024
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5  # calidades altas (>9) son demasiado lentas para respuestas dinámicas
+
+# Exportación de alertas (CSV por bloques, Parquet, Excel)
+VENTANAS_EXPORTACION = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30)
+}
+FORMATOS_EXPORTACION = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+FILAS_BLOQUE_EXPORTACION = 20_000
+MAX_FILAS_EXCEL = 1_048_575  # límite de hoja menos el encabezado
+BYTES_BLOQUE_ARCHIVO = 256 * 1024
+
+# Contadores horarios por barco (heatmap y tendencias)
+HORAS_CONTADOR = 24 * 7  # anillo de una semana, una columna por hora
+VENTANAS_HEATMAP = {'24h': '24 horas', '7d': '7 días (por hora del día)'}
+
+# Retención en memoria y vigilancia de memoria
+# Ventana máxima que usa el proceso (contadores de una semana y exportación a 30 días)
+RETENCION_INGESTA = max(timedelta(hours=HORAS_CONTADOR), *VENTANAS_EXPORTACION.values())
+INTERVALO_WATCHDOG = 30  # segundos
+LIMITE_MEMORIA_MB = float(os.environ.get('NIRSA_MEMORIA_MAX_MB', '1024'))  # RSS que dispara la evicción
+
+# Detección de anomalías en la tasa horaria (EWMA por barco y por equipo)
+ALFA_EWMA = 0.1  # peso de la última hora cerrada (~10h de vida media)
+UMBRAL_Z_ANOMALIA = 3.0
+MIN_ALERTAS_ANOMALIA = 3  # alertas en la hora en curso para considerar anomalía
+MIN_HORAS_DETECTOR = 24  # horas de historia antes de marcar anomalías
+VARIANZA_MINIMA = 0.25  # evita z enormes en barcos casi sin alertas
+
+# Matriz equipo x barco de toda la flota
+MAX_EQUIPOS_MATRIZ = 25
+ORDENES_MATRIZ_EQUIPOS = {'total': 'Total de alertas', 'barcos': 'Barcos afectados', 'nombre': 'Nombre'}
+
+# Intervalos entre alertas por equipo
+UMBRAL_RACHA = timedelta(minutes=30)  # alertas separadas por menos de esto forman una racha
+
+# Precálculo de detalles por barco (sidebar derecha)
+HILOS_DETALLE = 4
+
+# Grilla de velocímetros
+COLUMNAS_GRILLA = 5
+ALTO_CELDA_GRILLA = 230
+BARCOS_POR_PAGINA = 30
+MAX_BARCOS_SIN_COMPACTAR = 15
+MAX_ALERTAS_TILE_COMPACTO = 2
+MODOS_VELOCIMETROS = {'tarjetas': "Tarjetas individuales", 'figura': "Figura única (equipos de bajo recurso)"}
+
 # ============================================================================
 # CSS PERSONALIZADO
 # ============================================================================
@@ -403,6 +554,57 @@ app.index_string = '''
                 width: 100% !important;
             }
 
+            /* TILES COMPACTOS (flotas grandes, barcos con pocas alertas) */
+            .tiles-compactos {
+                display: grid;
+                grid-template-columns: repeat(auto-fill, minmax(150px, 1fr));
+                gap: 10px;
+                width: 100%;
+                margin-bottom: 30px;
+            }
+            .gauge-tile {
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+                padding: 8px 12px;
+                background: rgba(10,10,10,0.55);
+                border: 1px solid;
+                border-radius: 10px;
+                cursor: pointer;
+                user-select: none;
+                transition: transform 0.18s ease;
+            }
+            .gauge-tile:hover {
+                transform: translateY(-2px);
+            }
+            .tile-nombre {
+                font-size: 13px;
+                color: #ecf0f1;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                margin-right: 8px;
+            }
+            .tile-valor {
+                font-size: 18px;
+                font-weight: bold;
+            }
+
+            /* TENDENCIA HORARIA (SPARKLINE) EN TARJETAS */
+            .sparkline {
+                font-family: monospace;
+                font-size: 16px;
+                line-height: 18px;
+                letter-spacing: -1px;
+                color: #2ecc71;
+                margin-top: 4px;
+            }
+            .sparkline-delta {
+                font-size: 11px;
+                color: #bdc3c7;
+                margin-top: 2px;
+            }
+
             /* RESALTADO CON ANIMACIÓN */
             @keyframes gaugePulseThin {
                 0%   { transform: scale(1);   box-shadow: 0 0 0 rgba(241,196,15,0.0); }
@@ -482,6 +684,31 @@ app.index_string = '''
 # FUNCIONES AUXILIARES
 # ============================================================================
 
+_reloj_replay: Dict = {'inicio_real': None, 'inicio_virtual': None}
+_reloj_replay_lock = threading.Lock()
+
+
+def ahora_local() -> datetime:
+    """
+    Hora actual en ZONA_HORARIA. En modo replay es un reloj virtual que
+    avanza VELOCIDAD_REPLAY segundos por cada segundo real.
+    """
+    if not MODO_REPLAY:
+        return datetime.now(ZONA_HORARIA)
+
+    with _reloj_replay_lock:
+        if _reloj_replay['inicio_real'] is None:
+            _reloj_replay['inicio_virtual'] = inicio_replay()
+            _reloj_replay['inicio_real'] = time.monotonic()
+    transcurrido = (time.monotonic() - _reloj_replay['inicio_real']) * VELOCIDAD_REPLAY
+    return _reloj_replay['inicio_virtual'] + timedelta(seconds=transcurrido)
+
+
+def ahora_ns() -> int:
+    """ahora_local() en nanosegundos epoch UTC."""
+    return _fecha_a_ns(ahora_local()) if MODO_REPLAY else time.time_ns()
+
+
 def extraer_nombre_barco_de_area(area: str) -> Optional[str]:
     """Extrae el nombre del barco del campo Área usando expresiones regulares."""
     if not isinstance(area, str):
@@ -506,187 +733,622 @@ def extraer_nombre_barco_de_area(area: str) -> Optional[str]:
     return None
 
 
-def normalizar_nombre_barco(nombre: str) -> Optional[str]:
-    """Normaliza el nombre del barco para que coincida con la lista oficial."""
-    if not nombre:
-        return None
-    
+def limpiar_nombre_barco(nombre: str) -> str:
+    """Pasa a mayúsculas, elimina puntuación y colapsa espacios."""
     nombre = str(nombre).strip().upper()
     nombre = re.sub(r'[^\w\s]', '', nombre)
-    nombre = re.sub(r'\s+', ' ', nombre).strip()
-
-    # Mapeo especial para nombres alternativos comunes
-    mapeo_especial = {
-        'RICKY A': 'BP RICKY A', 
-        'BP RICKY': 'BP RICKY A', 
-        'RICK A': 'BP RICKY A',
-        'MARIA D MAR': 'MARIA DEL MAR', 
-        'MARIA D EL MAR': 'MARIA DEL MAR',
-        'ELIZABETH': 'ELIZABETH F', 
-        'ROSA': 'ROSA F', 
-        'MILENA': 'MILENA A',
-        'MILAGROS': 'MILAGROS A', 
-        'GLORIA': 'GLORIA A', 
-        'ROBERTO': 'ROBERTO A',
-        'GABRIELA': 'GABRIELA A', 
-        'RAFA': 'RAFA A',
+    return re.sub(r'\s+', ' ', nombre).strip()
+
+
+def _trigramas(texto: str) -> set:
+    """Conjunto de trigramas de un texto limpio (con relleno en los bordes)."""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def compilar_indice_flotas(config: Dict) -> Dict:
+    """
+    Compila el registro de flotas en un índice de búsqueda.
+
+    - 'exacto': nombre oficial o alias limpio -> barco oficial
+    - 'oficiales': nombre oficial limpio -> barco (para nombres contenidos en el texto)
+    - 'prefijos': prefijos (>= MIN_LARGO_PREFIJO) desde cada token del nombre oficial -> barco
+    """
+    flotas = {}
+    barcos = []
+    flota_de_barco = {}
+    exacto = {}
+    oficiales = {}
+    prefijos = {}
+    marcadores = []
+
+    for flota_id, flota in (config.get('flotas') or {}).items():
+        barcos_flota = list((flota.get('barcos') or {}).keys())
+        flotas[flota_id] = {
+            'nombre': flota.get('nombre', flota_id),
+            'marcadores': list(flota.get('marcadores') or []),
+            'barcos': barcos_flota
+        }
+        marcadores.extend(flotas[flota_id]['marcadores'])
+
+        for barco, alias in flota['barcos'].items():
+            if barco in flota_de_barco:
+                continue
+            barcos.append(barco)
+            flota_de_barco[barco] = flota_id
+
+            limpio = limpiar_nombre_barco(barco)
+            oficiales.setdefault(limpio, barco)
+            exacto.setdefault(limpio, barco)
+            for a in alias or []:
+                exacto.setdefault(limpiar_nombre_barco(a), barco)
+
+            tokens = limpio.split(' ')
+            for t in range(len(tokens)):
+                resto = ' '.join(tokens[t:])
+                for largo in range(MIN_LARGO_PREFIJO, len(resto) + 1):
+                    prefijos.setdefault(resto[:largo], barco)
+
+    patron = '|'.join(re.escape(m) for m in dict.fromkeys(marcadores)) or r'(?!)'
+
+    # Índice de trigramas sobre nombres oficiales y alias para sugerencias aproximadas
+    candidatos = list(exacto.items())
+    trigramas = {}
+    for pos, (texto, _) in enumerate(candidatos):
+        for trigrama in _trigramas(texto):
+            trigramas.setdefault(trigrama, []).append(pos)
+
+    return {
+        'flotas': flotas,
+        'barcos': barcos,
+        'flota_de_barco': flota_de_barco,
+        'exacto': exacto,
+        'oficiales': oficiales,
+        'prefijos': prefijos,
+        'patron_marcadores': re.compile(patron, re.IGNORECASE),
+        'max_tokens_oficial': max((len(n.split(' ')) for n in oficiales), default=0),
+        'candidatos': candidatos,
+        'trigramas_candidato': [len(_trigramas(texto)) for texto, _ in candidatos],
+        'trigramas': trigramas,
+        'sugerencias': {},
+        'fuentes': compilar_fuentes(config.get('fuentes'))
     }
-    
-    if nombre in mapeo_especial:
-        return mapeo_especial[nombre]
 
-    # Búsqueda fuzzy en la lista oficial
-    for barco in BARCOS_ATUNEROS:
-        barco_norm = re.sub(r'[^\w\s]', '', barco).strip()
-        if nombre == barco_norm or barco_norm in nombre or (len(nombre) >= 4 and nombre in barco_norm):
+
+def compilar_fuentes(fuentes: Optional[List[Dict]]) -> List[Dict]:
+    """Normaliza el registro de fuentes; sin fuentes usa el sheet SHEET_ID."""
+    compiladas = []
+    for i, fuente in enumerate(fuentes or [{'id': 'alertas', 'sheet_id': SHEET_ID}]):
+        url = fuente.get('url') or f"https://docs.google.com/spreadsheets/d/{fuente['sheet_id']}/export?format=csv"
+        compiladas.append({
+            'id': fuente.get('id') or f"fuente_{i}",
+            'nombre': fuente.get('nombre') or fuente.get('id') or url,
+            'url': url,
+            'timeout': float(fuente.get('timeout', TIMEOUT_FUENTE)),
+            'reintentos': int(fuente.get('reintentos', REINTENTOS_FUENTE))
+        })
+    return compiladas
+
+
+_registro_flotas = {'indice': None, 'mtime': None, 'revisado': 0.0}
+_registro_lock = threading.Lock()
+
+
+def obtener_registro_flotas() -> Dict:
+    """Retorna el índice compilado del registro, recargándolo si el archivo cambió."""
+    ahora = time.monotonic()
+    if _registro_flotas['indice'] is not None and ahora - _registro_flotas['revisado'] < INTERVALO_REVISION_REGISTRO:
+        return _registro_flotas['indice']
+
+    with _registro_lock:
+        _registro_flotas['revisado'] = ahora
+        try:
+            mtime = os.path.getmtime(RUTA_REGISTRO_FLOTAS)
+            if mtime != _registro_flotas['mtime'] or _registro_flotas['indice'] is None:
+                with open(RUTA_REGISTRO_FLOTAS, encoding='utf-8') as f:
+                    indice = compilar_indice_flotas(json.load(f))
+                _registro_flotas['indice'] = indice
+                _registro_flotas['mtime'] = mtime
+                print(f"Registro de flotas cargado: {len(indice['barcos'])} barcos en {len(indice['flotas'])} flotas")
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            if _registro_flotas['indice'] is None:
+                raise
+            print(f"Error recargando registro de flotas (se mantiene el anterior): {e}")
+
+    return _registro_flotas['indice']
+
+
+def sugerir_barco(area: str, indice: Optional[Dict] = None) -> Tuple[Optional[str], float]:
+    """
+    Sugiere el barco oficial más parecido a un texto de Área no identificado.
+
+    El puntaje es la fracción de trigramas del nombre (o alias) presentes en el
+    texto. El resultado se cachea por texto dentro del índice, así que se
+    invalida solo al recargar el registro.
+    """
+    indice = indice or obtener_registro_flotas()
+    cache_sugerencias = indice['sugerencias']
+    if area in cache_sugerencias:
+        return cache_sugerencias[area]
+
+    texto = indice['patron_marcadores'].sub(' ', str(area))
+    texto = limpiar_nombre_barco(re.sub(r'\bBARCO\b', ' ', texto, flags=re.IGNORECASE))
+
+    coincidencias = {}
+    for trigrama in _trigramas(texto):
+        for pos in indice['trigramas'].get(trigrama, ()):
+            coincidencias[pos] = coincidencias.get(pos, 0) + 1
+
+    mejor, puntaje = None, 0.0
+    for pos, cantidad in coincidencias.items():
+        valor = cantidad / indice['trigramas_candidato'][pos]
+        if valor > puntaje:
+            mejor, puntaje = indice['candidatos'][pos][1], valor
+
+    resultado = (mejor, round(puntaje, 3)) if puntaje >= MIN_PUNTAJE_SUGERENCIA else (None, round(puntaje, 3))
+    cache_sugerencias[area] = resultado
+    return resultado
+
+
+def obtener_barcos_flota() -> List[str]:
+    """Lista oficial de barcos monitoreados (todas las flotas del registro)."""
+    return obtener_registro_flotas()['barcos']
+
+
+def normalizar_nombre_barco(nombre: str, indice: Optional[Dict] = None) -> Optional[str]:
+    """Normaliza el nombre del barco para que coincida con la lista oficial."""
+    if not nombre:
+        return None
+
+    indice = indice or obtener_registro_flotas()
+    nombre = limpiar_nombre_barco(nombre)
+
+    # Nombre oficial o alias exacto
+    barco = indice['exacto'].get(nombre)
+    if barco:
+        return barco
+
+    # Nombre oficial contenido en el texto (secuencias de tokens, la más larga primero)
+    tokens = nombre.split(' ')
+    for largo in range(min(len(tokens), indice['max_tokens_oficial']), 0, -1):
+        for inicio in range(len(tokens) - largo + 1):
+            barco = indice['oficiales'].get(' '.join(tokens[inicio:inicio + largo]))
+            if barco:
+                return barco
+
+    # Fragmento del nombre oficial (prefijo desde un token)
+    if len(nombre) >= MIN_LARGO_PREFIJO:
+        barco = indice['prefijos'].get(nombre)
+        if barco:
             return barco
 
     return nombre
 
 
-@cache.memoize(timeout=60)
+_historial_pendiente: Dict[str, pd.DataFrame] = {}  # fuente -> filas completas aún no archivadas
+_historial_pendiente_lock = threading.Lock()
+
+
+def aplicar_retencion(df: pd.DataFrame, fuente: Optional[str] = None) -> pd.DataFrame:
+    """
+    Descarta las filas más antiguas que RETENCION_INGESTA (y las de fecha
+    inválida) apenas llegan. La columna Fecha queda ya parseada, así la
+    ingesta no vuelve a convertir texto.
+
+    La retención es solo para la copia en memoria: mientras el almacén no
+    recibió el historial completo, las filas sin recortar de cada fuente
+    quedan pendientes para sincronizar_store (ver historial_sin_retencion).
+    """
+    if df is None or df.empty or 'Fecha' not in df.columns:
+        return df
+
+    fechas = parsear_fechas(df['Fecha'])
+    if getattr(fechas.dt, 'tz', None) is None:
+        fechas = fechas.dt.tz_localize(ZONA_HORARIA, ambiguous='NaT', nonexistent='NaT')
+    validas = fechas.notna().to_numpy()
+    conservar = (fechas >= ahora_local() - RETENCION_INGESTA).to_numpy()
+
+    invalidas = int((~validas).sum())
+    if invalidas:
+        print(f"Ingesta: {invalidas} filas con fecha inválida descartadas")
+    if fuente is not None and not _store_sincronizado['historial'] and not conservar[validas].all():
+        with _historial_pendiente_lock:
+            _historial_pendiente[fuente] = df[validas].assign(Fecha=fechas[validas]).reset_index(drop=True)
+    return df[conservar].assign(Fecha=fechas[conservar]).reset_index(drop=True)
+
+
+def historial_sin_retencion(df_raw_local: pd.DataFrame) -> pd.DataFrame:
+    """
+    Historial para el primer volcado al almacén: df_raw_local más las filas
+    antiguas que la retención sacó de memoria (sin duplicar las que siguen
+    en la ventana).
+    """
+    with _historial_pendiente_lock:
+        pendientes = list(_historial_pendiente.values())
+    if not pendientes:
+        return df_raw_local
+
+    limite = ahora_local() - RETENCION_INGESTA
+    antiguas = [df[(df['Fecha'] < limite).to_numpy()] for df in pendientes]
+    return pd.concat([*antiguas, df_raw_local], ignore_index=True)
+
+
+_estado_fuentes: Dict[str, Dict] = {}
+_estado_fuentes_lock = threading.Lock()
+_descarga_lock = threading.Lock()
+
+
+def alinear_columnas_fuente(df: pd.DataFrame) -> pd.DataFrame:
+    """Renombra las variantes de MAPEO_COLUMNAS al nombre estándar y descarta el resto."""
+    columnas = {}
+    for std, variantes in MAPEO_COLUMNAS.items():
+        origen = std if std in df.columns else next((var for var in variantes if var in df.columns), None)
+        if origen is not None:
+            columnas[std] = df[origen]
+    return pd.DataFrame(columnas)
+
+
+async def _descargar_fuente(cliente: "httpx.AsyncClient", fuente: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Descarga una fuente con timeout por intento y reintentos con backoff exponencial."""
+    import httpx
+
+    error = None
+    for intento in range(fuente['reintentos'] + 1):
+        try:
+            respuesta = await cliente.get(fuente['url'], timeout=fuente['timeout'])
+            if respuesta.status_code == 200:
+                return respuesta.text, None
+            error = f"Error HTTP {respuesta.status_code}"
+        except httpx.TimeoutException:
+            error = "Timeout al conectar"
+        except httpx.HTTPError as e:
+            error = f"Error de conexión: {str(e)}"
+        if intento < fuente['reintentos']:
+            await asyncio.sleep(BACKOFF_BASE_FUENTE * 2 ** intento)
+    return None, error
+
+
+async def _descargar_fuentes(fuentes: List[Dict]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Descarga todas las fuentes en paralelo: el tiempo total es el de la más lenta."""
+    import httpx  # diferido: solo se necesita al descargar, no al arrancar
+
+    async with httpx.AsyncClient(follow_redirects=True) as cliente:
+        return await asyncio.gather(*(_descargar_fuente(cliente, fuente) for fuente in fuentes))
+
+
 def cargar_datos_google_sheets() -> Tuple[pd.DataFrame, Optional[str]]:
-    """Carga los datos desde Google Sheets y los retorna como DataFrame."""
-    try:
-        url = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv"
-        response = requests.get(url, timeout=30)
-        
-        if response.status_code != 200:
-            return pd.DataFrame(), f"Error HTTP {response.status_code}"
-        
-        df = pd.read_csv(StringIO(response.text))
-        return df, None
-    
-    except requests.exceptions.Timeout:
-        return pd.DataFrame(), "Timeout al conectar con Google Sheets"
-    except requests.exceptions.RequestException as e:
-        return pd.DataFrame(), f"Error de conexión: {str(e)}"
-    except Exception as e:
-        return pd.DataFrame(), f"Error inesperado: {str(e)}"
+    """
+    Descarga en paralelo las fuentes del registro y las une en un solo
+    DataFrame con las columnas estándar. Cada fuente se descarga como mucho
+    cada INTERVALO_DESCARGA segundos y solo se vuelve a parsear si cambió
+    su contenido (huella). Una fuente que falla usa su último contenido
+    válido y no se reintenta hasta que vence su backoff; solo se retorna
+    error si ninguna fuente tiene datos.
+    """
+    fuentes = obtener_registro_flotas()['fuentes']
 
+    with _descarga_lock:
+        ahora = time.monotonic()
+        with _estado_fuentes_lock:
+            pendientes = [
+                f for f in fuentes
+                if _estado_fuentes.get(f['id'], {}).get('reintentar_en', 0) <= ahora
+                and ahora - _estado_fuentes.get(f['id'], {}).get('descargado', -INTERVALO_DESCARGA) >= INTERVALO_DESCARGA
+            ]
 
-def preparar_df_flota_24h(df_raw_local: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-    """Procesa el DataFrame raw y filtra los datos de la flota de las últimas 24 horas."""
-    debug = []
-    
-    if df_raw_local is None or df_raw_local.empty:
-        return pd.DataFrame(), ["DataFrame vacío"]
+        try:
+            resultados = asyncio.run(_descargar_fuentes(pendientes)) if pendientes else []
+        except Exception as e:
+            resultados = [(None, f"Error inesperado: {str(e)}")] * len(pendientes)
+
+        errores = []
+        with _estado_fuentes_lock:
+            for fuente, (texto, error) in zip(pendientes, resultados):
+                estado = _estado_fuentes.setdefault(
+                    fuente['id'], {'fallos': 0, 'reintentar_en': 0, 'df': None, 'huella': None}
+                )
+                if error is None:
+                    huella = hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+                    try:
+                        if huella != estado.get('huella') or estado['df'] is None:
+                            estado['df'] = aplicar_retencion(
+                                alinear_columnas_fuente(pd.read_csv(StringIO(texto))), fuente['id']
+                            )
+                            estado['huella'] = huella
+                        else:
+                            estado['df'] = aplicar_retencion(estado['df'])
+                    except (ValueError, pd.errors.ParserError) as e:
+                        error = f"CSV inválido: {str(e)}"
+                if error is None:
+                    estado['fallos'] = 0
+                    estado['reintentar_en'] = 0
+                    estado['descargado'] = ahora
+                else:
+                    estado['fallos'] += 1
+                    estado['reintentar_en'] = ahora + min(BACKOFF_MAX_FUENTE, BACKOFF_BASE_FUENTE * 2 ** estado['fallos'])
+                    errores.append(f"{fuente['nombre']}: {error}")
+                    print(f"Error en fuente {fuente['nombre']} (fallo {estado['fallos']}): {error}")
+
+            disponibles = [(_estado_fuentes[f['id']]['huella'], _estado_fuentes[f['id']]['df']) for f in fuentes
+                           if _estado_fuentes.get(f['id'], {}).get('df') is not None]
+
+    if not disponibles:
+        return pd.DataFrame(), "; ".join(errores) or "Sin fuentes disponibles"
+
+    # La unión se cachea por las huellas de las fuentes, no por tiempo
+    clave = ('crudo',) + tuple(huella for huella, _ in disponibles) + (sum(len(df) for _, df in disponibles),)
+    df_raw = cache_obtener(clave)
+    if df_raw is None:
+        df_raw = cache_guardar(clave, pd.concat([df for _, df in disponibles], ignore_index=True))
+    return df_raw, None
+
+
+_replay: Dict = {'grabado': None, 'fechas_ns': None, 'generado': [], 'generado_hasta': None, 'rng': None}
+_replay_lock = threading.Lock()
+
+
+def _leer_grabacion_replay() -> pd.DataFrame:
+    """Une los CSV grabados (archivo o carpeta), sin duplicados, con columnas estándar."""
+    ruta = MODO_REPLAY
+    archivos = sorted(
+        os.path.join(ruta, nombre) for nombre in os.listdir(ruta) if nombre.lower().endswith('.csv')
+    ) if os.path.isdir(ruta) else [ruta]
+    grabado = pd.concat([alinear_columnas_fuente(pd.read_csv(archivo)) for archivo in archivos], ignore_index=True)
+    return grabado.drop_duplicates(ignore_index=True)
+
+
+def inicio_replay() -> datetime:
+    """Hora virtual inicial: NIRSA_REPLAY_INICIO, la primera alerta grabada o la hora real."""
+    if INICIO_REPLAY:
+        inicio = pd.Timestamp(INICIO_REPLAY)
+        return (inicio.tz_localize(ZONA_HORARIA) if inicio.tzinfo is None else inicio.tz_convert(ZONA_HORARIA)).to_pydatetime()
+    if MODO_REPLAY != 'sintetico':
+        with _replay_lock:
+            _cargar_grabacion_replay()
+            if len(_replay['fechas_ns']):
+                return pd.Timestamp(int(_replay['fechas_ns'][0]), tz='UTC').tz_convert(ZONA_HORARIA).to_pydatetime()
+    return datetime.now(ZONA_HORARIA)
+
+
+def _cargar_grabacion_replay() -> None:
+    if _replay['grabado'] is not None:
+        return
+    grabado = _leer_grabacion_replay()
+    fechas = parsear_fechas(grabado['Fecha'])
+    if getattr(fechas.dt, 'tz', None) is None:
+        fechas = fechas.dt.tz_localize(ZONA_HORARIA, ambiguous='NaT', nonexistent='NaT')
+    validas = fechas.notna().to_numpy()
+    orden = np.argsort(fechas[validas].astype('int64').to_numpy(), kind='stable')
+    _replay['grabado'] = grabado[validas].iloc[orden].reset_index(drop=True)
+    _replay['fechas_ns'] = fechas[validas].astype('int64').to_numpy()[orden]
+
+
+def _generar_alertas_sinteticas(desde: datetime, hasta: datetime) -> pd.DataFrame:
+    """Alertas con llegadas Poisson por barco (y ráfagas ocasionales) en [desde, hasta), en formato del sheet."""
+    rng = _replay['rng']
+    barcos = obtener_barcos_flota()
+    horas = (hasta - desde).total_seconds() / 3600
+    if horas <= 0 or not barcos:
+        return pd.DataFrame()
 
-    df = df_raw_local.copy()
+    if 'tasas' not in _replay:
+        _replay['tasas'] = rng.uniform(*TASA_SINTETICA, size=len(barcos))
+    tasas = np.resize(_replay['tasas'], len(barcos))
+    rafagas = rng.random(len(barcos)) < PROBABILIDAD_RAFAGA * horas
+    cantidades = rng.poisson(tasas * horas) + rafagas * rng.poisson(ALERTAS_RAFAGA, size=len(barcos))
+    total = int(cantidades.sum())
+    if total == 0:
+        return pd.DataFrame()
 
-    # Mapeo de columnas alternativas
-    mapeo_cols = {
-        'Fecha': ['Fecha', 'FECHA', 'fecha', 'FECHA Y HORA', 'Fecha y hora'],
-        'Area': ['Área', 'Area', 'ÁREA', 'AREA', 'Área de Alerta', 'AREA DE ALERTA'],
-        'Activo': ['Activo', 'ACTIVO', 'activo', 'Equipo', 'EQUIPO', 'equipo'],
-        'Alerta': ['Alerta', 'ALERTA', 'alerta', 'Tipo de Alerta', 'TIPO DE ALERTA', 'Tipo de alerta']
-    }
-    
-    for std, variantes in mapeo_cols.items():
-        if std in df.columns:
-            continue
-        for var in variantes:
-            if var in df.columns:
-                df = df.rename(columns={var: std})
-                break
+    inicio_ns = _fecha_a_ns(desde)
+    fechas = pd.to_datetime(
+        inicio_ns + (rng.random(total) * (hasta - desde).total_seconds() * 1e9).astype(np.int64), utc=True
+    ).tz_convert(ZONA_HORARIA)
+    barco = np.repeat(np.array(barcos, dtype=object), cantidades)
+    return pd.DataFrame({
+        'Fecha': fechas.strftime('%d/%m/%Y %H:%M:%S'),
+        'Area': [f"🐟 FLOTA ATUNERA (BARCO {b})" for b in barco],
+        'Activo': rng.choice(EQUIPOS_SINTETICOS, size=total),
+        'Alerta': rng.choice(ALERTAS_SINTETICAS, size=total)
+    })
 
-    # Validar columnas requeridas
-    if 'Fecha' not in df.columns or 'Area' not in df.columns:
-        return pd.DataFrame(), [f"Columnas faltantes. Disponibles: {list(df.columns)}"]
 
-    df['Fecha_Original'] = df['Fecha']
+def cargar_datos_replay() -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Contenido del "sheet" a la hora virtual: las filas grabadas con fecha
+    hasta ahora_local(), o el generador sintético avanzado hasta esa hora
+    (con una semana de historia previa para los contadores y el detector).
+    """
+    ahora = ahora_local()
+    with _replay_lock:
+        if MODO_REPLAY != 'sintetico':
+            try:
+                _cargar_grabacion_replay()
+            except (OSError, ValueError, KeyError) as e:
+                return pd.DataFrame(), f"Error leyendo grabación de replay: {str(e)}"
+            visibles = int(np.searchsorted(_replay['fechas_ns'], _fecha_a_ns(ahora), side='right'))
+            return _replay['grabado'].iloc[:visibles], None
+
+        if _replay['rng'] is None:
+            _replay['rng'] = np.random.default_rng(SEMILLA_REPLAY)
+            _replay['generado_hasta'] = ahora - timedelta(hours=HORAS_CONTADOR)
+
+        nuevas = _generar_alertas_sinteticas(_replay['generado_hasta'], ahora)
+        _replay['generado_hasta'] = ahora
+        if not nuevas.empty:
+            _replay['generado'].append((ahora, nuevas))
+
+        # Descartar bloques generados que ya salieron de la semana de contadores
+        limite = ahora - timedelta(hours=HORAS_CONTADOR + 24)
+        _replay['generado'] = [(hasta, df) for hasta, df in _replay['generado'] if hasta >= limite]
+        if not _replay['generado']:
+            return pd.DataFrame(), "Replay sintético sin alertas todavía"
+        return pd.concat([df for _, df in _replay['generado']], ignore_index=True), None
+
+
+def cargar_datos() -> Tuple[pd.DataFrame, Optional[str]]:
+    """Datos crudos de la fuente activa: replay (NIRSA_REPLAY) o las fuentes registradas."""
+    if MODO_REPLAY:
+        df_raw, error = cargar_datos_replay()
+        return aplicar_retencion(df_raw, 'replay'), error
+    return cargar_datos_google_sheets()
+
+
+def columna_categorica(serie: pd.Series, vacio: Optional[str] = None) -> pd.Series:
+    """
+    Convierte una columna de texto repetitivo en categórica, limpiando espacios.
 
-    # Intentar conversión de fechas con múltiples formatos
-    df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce', dayfirst=True, utc=False)
+    La limpieza se hace sobre los valores únicos y no fila por fila. Si se indica
+    `vacio`, los nulos se reemplazan por ese valor.
+    """
+    codigos, unicos = pd.factorize(serie)
+    limpios = pd.Index(unicos).astype(str).str.strip()
+    if vacio is not None:
+        limpios = limpios.append(pd.Index([vacio]))
+    nuevos_codigos, categorias = pd.factorize(limpios)
+    if vacio is None:
+        nuevos_codigos = np.append(nuevos_codigos, -1)
+
+    # codigos == -1 (nulos) toma el último elemento: `vacio` o nulo
+    return pd.Series(
+        pd.Categorical.from_codes(nuevos_codigos[codigos], categories=categorias),
+        index=serie.index,
+        name=serie.name
+    )
 
-    mask = df['Fecha'].isna()
-    if mask.any():
-        df.loc[mask, 'Fecha'] = pd.to_datetime(
-            df.loc[mask, 'Fecha_Original'],
-            errors='coerce',
-            format='%d/%m/%Y %H:%M:%S'
-        )
 
-    mask = df['Fecha'].isna()
-    if mask.any():
-        df.loc[mask, 'Fecha'] = pd.to_datetime(
-            df.loc[mask, 'Fecha_Original'],
-            errors='coerce',
-            format='%m/%d/%Y %H:%M:%S'
-        )
+def parsear_fechas(texto: pd.Series) -> pd.Series:
+    """Convierte la columna de fechas del sheet probando varios formatos."""
+    fechas = pd.to_datetime(texto, errors='coerce', dayfirst=True, utc=False)
+
+    for formato in ('%d/%m/%Y %H:%M:%S', '%m/%d/%Y %H:%M:%S', None):
+        mask = fechas.isna()
+        if not mask.any():
+            break
+        fechas.loc[mask] = pd.to_datetime(texto[mask], errors='coerce', format=formato)
+
+    return fechas
+
 
-    mask = df['Fecha'].isna()
-    if mask.any():
-        df.loc[mask, 'Fecha'] = pd.to_datetime(
-            df.loc[mask, 'Fecha_Original'],
-            errors='coerce'
+def normalizar_esquema_ingesta(df_raw_local: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Reduce el DataFrame del sheet al esquema compacto de alertas.
+
+    Solo conserva las columnas de MAPEO_COLUMNAS; Área, Activo y Alerta quedan
+    como categóricas y Fecha como datetime64[ns] con zona horaria (int64 interno).
+    """
+    columnas = {}
+    for std, variantes in MAPEO_COLUMNAS.items():
+        origen = std if std in df_raw_local.columns else next(
+            (var for var in variantes if var in df_raw_local.columns), None
         )
+        if origen is not None:
+            columnas[std] = df_raw_local[origen]
+
+    # Validar columnas requeridas
+    if 'Fecha' not in columnas or 'Area' not in columnas:
+        return pd.DataFrame(), [f"Columnas faltantes. Disponibles: {list(df_raw_local.columns)}"]
 
-    df = df[df['Fecha'].notna()].copy()
-    debug.append(f"✅ Fechas válidas: {len(df)}/{len(df_raw_local)}")
+    fechas = parsear_fechas(columnas['Fecha'])
+    validas = fechas.notna().to_numpy()
+    debug = [f"✅ Fechas válidas: {int(validas.sum())}/{len(df_raw_local)}"]
 
-    if df.empty:
-        ejemplos = df_raw_local['Fecha'].head(5).tolist() if 'Fecha' in df_raw_local.columns else []
+    if not validas.any():
+        ejemplos = columnas['Fecha'].head(5).tolist()
         return pd.DataFrame(), [f"No se pudieron convertir fechas. Ejemplos: {ejemplos}"]
 
+    df = pd.DataFrame({'Fecha': fechas[validas]})
+    df['Area'] = columna_categorica(columnas['Area'][validas])
+    # Activo y Alerta siempre existen (fuentes sin esa columna quedan con el valor por defecto)
+    sin_columna = pd.Series(None, index=df_raw_local.index, dtype=object)
+    df['Activo'] = columna_categorica(columnas.get('Activo', sin_columna)[validas], 'SIN ACTIVO')
+    df['Alerta'] = columna_categorica(columnas.get('Alerta', sin_columna)[validas], 'SIN ALERTA')
+
     # Ajustar zona horaria
     if getattr(df['Fecha'].dt, 'tz', None) is None:
         df['Fecha'] = df['Fecha'].dt.tz_localize(ZONA_HORARIA, ambiguous='NaT', nonexistent='NaT')
     else:
         df['Fecha'] = df['Fecha'].dt.tz_convert(ZONA_HORARIA)
 
-    df = df[df['Fecha'].notna()].copy()
+    return df[df['Fecha'].notna()], debug
+
+
+def preparar_df_flota_24h(df_raw_local: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """Procesa el DataFrame raw y filtra los datos de la flota de las últimas 24 horas."""
+    if df_raw_local is None or df_raw_local.empty:
+        return pd.DataFrame(), ["DataFrame vacío"]
+
+    df, debug = normalizar_esquema_ingesta(df_raw_local)
+    if df.empty:
+        return pd.DataFrame(), debug
 
     # Filtrar últimas 24 horas
-    ahora_ec = datetime.now(ZONA_HORARIA)
+    ahora_ec = ahora_local()
     limite_ec = ahora_ec - timedelta(hours=24)
 
     debug.append(f"⏰ Límite 24h (EC): {limite_ec.strftime('%d/%m/%Y %H:%M:%S %Z')}")
     debug.append(f"⏰ Ahora (EC): {ahora_ec.strftime('%d/%m/%Y %H:%M:%S %Z')}")
 
-    df_24h = df[df['Fecha'] >= limite_ec].copy()
+    df_24h = df[df['Fecha'] >= limite_ec]
     debug.append(f"📊 Registros totales: {len(df)}")
     debug.append(f"📊 Registros 24h: {len(df_24h)}")
 
     if df_24h.empty:
         return pd.DataFrame(), debug + ["⚠️ Sin registros en 24h"]
 
-    # Filtrar flota atunera
-    patrones = ['🐟', 'FLOTA ATUNERA', 'Flota Atunera', 'flota atunera', 'ATUNERA', 'atunera']
-    area_str = df_24h['Area'].astype(str)
-    mask_flota = pd.Series(False, index=df_24h.index)
-    
-    for patron in patrones:
-        mask_flota |= area_str.str.contains(patron, case=False, na=False)
-
-    df_flota = df_24h[mask_flota].copy()
+    df_flota = identificar_flota(df_24h)
     debug.append(f"🚢 Registros flota atunera (24h): {len(df_flota)}")
 
     if df_flota.empty:
         return pd.DataFrame(), debug + ["⚠️ Sin flota atunera en 24h"]
 
-    # Extraer y normalizar nombres de barcos
-    df_flota['Barco_Extraido'] = df_flota['Area'].apply(extraer_nombre_barco_de_area)
-    df_flota['Barco_Normalizado'] = df_flota['Barco_Extraido'].apply(normalizar_nombre_barco)
+    # Descartar filas reimportadas (mismo hash) y ordenar por fecha
+    df_flota = df_flota.assign(Id=calcular_hash_filas(df_flota))
+    duplicadas = df_flota['Id'].duplicated()
+    if duplicadas.any():
+        debug.append(f"♻️ Filas duplicadas descartadas: {int(duplicadas.sum())}")
+        df_flota = df_flota[~duplicadas]
+
+    return df_flota.sort_values('Fecha', kind='stable'), debug
+
 
-    return df_flota, debug
+def identificar_flota(df: pd.DataFrame) -> pd.DataFrame:
+    """Filtra las filas de las flotas del registro y normaliza el barco de cada una."""
+    # Filtrar flotas del registro por sus marcadores (evaluado sobre las categorías)
+    indice = obtener_registro_flotas()
+    areas = df['Area'].cat.categories
+    es_flota = np.append(areas.str.contains(indice['patron_marcadores']), False)
+    df_flota = df[es_flota[df['Area'].cat.codes.to_numpy()]]
 
+    if df_flota.empty:
+        return df_flota
+
+    # Extraer y normalizar nombres de barcos (una vez por cada Área distinta)
+    areas_flota = areas[es_flota[:-1]]
+    extraidos = {area: extraer_nombre_barco_de_area(area) for area in areas_flota}
+    normalizados = {area: normalizar_nombre_barco(extraidos[area], indice) for area in areas_flota}
+    barco_normalizado = df_flota['Area'].map(normalizados).astype('category')
+    return df_flota.assign(
+        Barco_Extraido=df_flota['Area'].map(extraidos).astype('category'),
+        Barco_Normalizado=barco_normalizado,
+        Flota=barco_normalizado.map(indice['flota_de_barco']).astype('category')
+    )
 
-def procesar_alertas_ultimas_24h(df_raw_local: pd.DataFrame) -> Tuple[Dict[str, int], int, List[str]]:
-    """Procesa las alertas de las últimas 24 horas y retorna conteos por barco."""
-    conteo_por_barco = {barco: 0 for barco in BARCOS_ATUNEROS}
+
+def contar_alertas_por_barco(df_flota: pd.DataFrame, debug: List[str]) -> Tuple[Dict[str, int], int, List[str]]:
+    """Cuenta las alertas por barco a partir del DataFrame de flota ya procesado."""
+    barcos_flota = obtener_barcos_flota()
+    conteo_por_barco = {barco: 0 for barco in barcos_flota}
     alertas_sin_barco_local = 0
 
-    df_flota, debug = preparar_df_flota_24h(df_raw_local)
     if df_flota.empty:
         return conteo_por_barco, 0, debug
 
-    df_con = df_flota[df_flota['Barco_Normalizado'].notna()].copy()
-    df_sin = df_flota[df_flota['Barco_Normalizado'].isna()].copy()
-    alertas_sin_barco_local = len(df_sin)
+    alertas_sin_barco_local = int(df_flota['Barco_Normalizado'].isna().sum())
 
-    df_con = df_con[df_con['Barco_Normalizado'].isin(BARCOS_ATUNEROS)].copy()
-    conteo_raw = df_con['Barco_Normalizado'].value_counts().to_dict()
+    df_con = df_flota[df_flota['Barco_Normalizado'].isin(barcos_flota)]
+    conteo_raw = df_con['Barco_Normalizado'].value_counts()
+    conteo_raw = conteo_raw[conteo_raw > 0].to_dict()
 
     for barco, cant in conteo_raw.items():
         conteo_por_barco[barco] = int(cant)
@@ -699,16 +1361,105 @@ def procesar_alertas_ultimas_24h(df_raw_local: pd.DataFrame) -> Tuple[Dict[str,
     return conteo_por_barco, alertas_sin_barco_local, debug
 
 
-def crear_velocimetro_24h(valor: int, titulo_barco: str, max_valor: int = 30) -> go.Figure:
-    """Crea un gráfico de velocímetro para mostrar las alertas de un barco."""
+def resumir_alertas_sin_identificar(df_flota: pd.DataFrame, top: int = TOP_SIN_IDENTIFICAR) -> List[Dict]:
+    """Agrupa las alertas sin barco oficial por Área y sugiere el barco más probable."""
+    if df_flota is None or df_flota.empty:
+        return []
+
+    indice = obtener_registro_flotas()
+    mask = ~df_flota['Barco_Normalizado'].isin(indice['barcos'])
+    if not mask.any():
+        return []
+
+    resumen = []
+    for area, cantidad in df_flota.loc[mask, 'Area'].astype(str).value_counts().head(top).items():
+        sugerencia, puntaje = sugerir_barco(area, indice)
+        resumen.append({
+            'area': area,
+            'cantidad': int(cantidad),
+            'sugerencia': sugerencia,
+            'puntaje': puntaje
+        })
+    return resumen
+
+
+def detectar_filas_nuevas(df_flota: pd.DataFrame, marca_previa: Optional[Dict]) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Separa las alertas que no estaban en la actualización anterior.
+
+    `df_flota` debe venir ordenado por Fecha y con la columna Id (hash de fila).
+    La marca guarda la fecha máxima vista y los hashes de la franja de
+    TOLERANCIA_LLEGADA anterior a ella, así que solo se revisan las filas
+    posteriores a esa franja: el costo es O(filas nuevas + franja).
+    Sin marca previa (primera carga) todo se toma como línea base.
+    """
+    if df_flota is None or df_flota.empty:
+        return pd.DataFrame(), marca_previa or {}
+
+    tolerancia = int(TOLERANCIA_LLEGADA.total_seconds() * 1e9)
+
+    # Una fecha futura (reloj del equipo, día/mes invertidos) no debe adelantar la marca:
+    # esas filas se ignoran hasta que su fecha llegue y la marca nunca pasa de ahora
+    limite = ahora_ns() + tolerancia
+    fechas = df_flota['Fecha'].astype('int64').to_numpy()
+    fin = int(np.searchsorted(fechas, limite, side='right'))
+    if fin == 0:
+        return df_flota.iloc[0:0], marca_previa or {}
+    fechas = fechas[:fin]
+    hashes = df_flota['Id'].to_numpy()[:fin]
+    df_flota = df_flota.iloc[:fin]
+    previa = min(int((marca_previa or {}).get('hasta') or 0), limite)
+
+    if marca_previa and marca_previa.get('hasta') is not None:
+        inicio = int(np.searchsorted(fechas, previa - tolerancia, side='left'))
+        frontera = np.array([int(h) for h in marca_previa.get('frontera', [])], dtype=np.int64)
+        es_nueva = ~np.isin(hashes[inicio:], frontera)
+        df_nuevas = df_flota.iloc[inicio:][es_nueva]
+    else:
+        df_nuevas = df_flota.iloc[0:0]
+
+    hasta = max(int(fechas[-1]), previa)
+    corte = int(np.searchsorted(fechas, hasta - tolerancia, side='left'))
+    marca = {'hasta': hasta, 'frontera': [str(h) for h in hashes[corte:].tolist()]}
+
+    return df_nuevas, marca
+
+
+def resumir_alertas_nuevas(df_nuevas: pd.DataFrame) -> Dict[str, Dict]:
+    """Por barco: cantidad de alertas nuevas y equipo de la más reciente."""
+    if df_nuevas is None or df_nuevas.empty:
+        return {}
+
+    df = df_nuevas[df_nuevas['Barco_Normalizado'].isin(obtener_barcos_flota())]
+    if df.empty:
+        return {}
+
+    ultimas = df.groupby('Barco_Normalizado', observed=True).tail(1)
+    cantidades = df['Barco_Normalizado'].value_counts()
+    resumen = {}
+    for barco, equipo in zip(ultimas['Barco_Normalizado'], ultimas.get('Activo', pd.Series(None, index=ultimas.index))):
+        resumen[str(barco)] = {
+            'cantidad': int(cantidades[barco]),
+            'equipo': str(equipo).strip() if pd.notna(equipo) else None
+        }
+    return dict(list(resumen.items())[:MAX_EVENTOS_NUEVOS])
+
+
+def _estado_velocimetro(valor: int) -> Tuple[str, str, str]:
+    """Retorna (estado, color, emoji) según la franja de alertas del barco."""
     if valor == 0:
-        estado, color, emoji = "Sin Alerta", "#2ecc71", "✅"
+        return "Sin Alerta", "#2ecc71", "✅"
     elif valor <= 6:
-        estado, color, emoji = "Alerta", "#f1c40f", "⚠️"
+        return "Alerta", "#f1c40f", "⚠️"
     elif valor <= 10:
-        estado, color, emoji = "Crítico", "#e74c3c", "🔴"
-    else:
-        estado, color, emoji = "Crítico Máximo", "#c0392b", "🚨"
+        return "Crítico", "#e74c3c", "🔴"
+    return "Crítico Máximo", "#c0392b", "🚨"
+
+
+def crear_indicador_velocimetro(valor: int, max_valor: int = 30, domain: Optional[Dict] = None,
+                                titulo_barco: Optional[str] = None) -> go.Indicator:
+    """Crea la traza Indicator del velocímetro de un barco."""
+    estado, color, emoji = _estado_velocimetro(valor)
 
     rangos = [0, 0.5, 6.5, 10.5, max_valor]
     colores = [
@@ -718,18 +1469,22 @@ def crear_velocimetro_24h(valor: int, titulo_barco: str, max_valor: int = 30) ->
         COLORES_FRANJAS['rojo_oscuro']
     ]
 
-    fig = go.Figure(go.Indicator(
+    titulo = f"<span style='color: {color}; font-size:13px'>{emoji} {estado}</span>"
+    if titulo_barco:
+        titulo = f"<span style='color:#ecf0f1; font-size:16px'><b>{titulo_barco}</b></span><br>{titulo}"
+
+    return go.Indicator(
         mode="gauge+number",
         value=valor,
         title={
-            'text': f"<span style='color: {color}; font-size:13px'>{emoji} {estado}</span>",
+            'text': titulo,
             'font': {'size': 13}
         },
         number={
             'font': {'size': 38, 'color': color, 'family': "Arial Black"},
             'suffix': "<br><span style='font-size:10px; color:#bdc3c7'>alertas (24h)</span>"
         },
-        domain={'x': [0, 1], 'y': [0, 1]},
+        domain=domain or {'x': [0, 1], 'y': [0, 1]},
         gauge={
             'axis': {
                 'range': [0, max_valor], 
@@ -751,7 +1506,12 @@ def crear_velocimetro_24h(valor: int, titulo_barco: str, max_valor: int = 30) ->
                 'value': valor
             }
         }
-    ))
+    )
+
+
+def crear_velocimetro_24h(valor: int, titulo_barco: str, max_valor: int = 30) -> go.Figure:
+    """Crea un gráfico de velocímetro para mostrar las alertas de un barco."""
+    fig = go.Figure(crear_indicador_velocimetro(valor, max_valor))
 
     fig.update_layout(
         height=176,
@@ -764,32 +1524,199 @@ def crear_velocimetro_24h(valor: int, titulo_barco: str, max_valor: int = 30) ->
     return fig
 
 
-def obtener_detalle_barco_24h(df_raw_local: pd.DataFrame, barco_seleccionado: str) -> pd.DataFrame:
-    """Obtiene el detalle de alertas por equipo para un barco específico."""
-    if df_raw_local is None or df_raw_local.empty:
-        return pd.DataFrame()
+def crear_grilla_velocimetros(barcos_ordenados: List[str], conteo: Dict[str, int],
+                              resaltados: Optional[Dict[str, Optional[str]]] = None,
+                              columnas: int = COLUMNAS_GRILLA, max_valor: int = 30) -> go.Figure:
+    """
+    Crea una sola figura con la grilla de velocímetros de toda la flota.
 
-    df_flota, _ = preparar_df_flota_24h(df_raw_local)
-    if df_flota.empty:
-        return pd.DataFrame()
+    Los Indicator no emiten eventos de clic, por eso se superpone una traza
+    Scatter transparente con un punto por celda (customdata = barco) que
+    alimenta el clickData del gráfico.
+    """
+    resaltados = resaltados or {}
+    n = len(barcos_ordenados)
+    columnas = max(1, min(columnas, n or 1))
+    filas = max(1, -(-n // columnas))
+    margen_x, margen_y = 0.02, 0.12
+
+    trazas = []
+    formas = []
+    anotaciones = []
+    centros_x, centros_y = [], []
+
+    for i, barco in enumerate(barcos_ordenados):
+        fila, col = divmod(i, columnas)
+        x0, x1 = col / columnas, (col + 1) / columnas
+        y0, y1 = 1 - (fila + 1) / filas, 1 - fila / filas
+        alto = y1 - y0
+
+        trazas.append(crear_indicador_velocimetro(
+            int(conteo.get(barco, 0)),
+            max_valor,
+            domain={
+                'x': [x0 + margen_x / columnas, x1 - margen_x / columnas],
+                'y': [y0 + 0.02 * alto, y1 - margen_y * alto]
+            },
+            titulo_barco=barco
+        ))
+        centros_x.append(col + 0.5)
+        centros_y.append(filas - fila - 0.5)
+
+        if barco in resaltados:
+            formas.append(dict(
+                type='rect', xref='paper', yref='paper',
+                x0=x0 + 0.005, x1=x1 - 0.005, y0=y0 + 0.005, y1=y1 - 0.005,
+                line={'color': 'rgba(241,196,15,0.95)', 'width': 2}
+            ))
+            if resaltados[barco]:
+                anotaciones.append(dict(
+                    text=f"<b>{resaltados[barco]}</b>", xref='paper', yref='paper',
+                    x=(x0 + x1) / 2, y=y1, yanchor='top', showarrow=False,
+                    font={'color': '#000000', 'size': 12}, bgcolor='rgba(241,196,15,0.95)'
+                ))
+
+    trazas.append(go.Scatter(
+        x=centros_x,
+        y=centros_y,
+        customdata=barcos_ordenados,
+        mode='markers',
+        marker={'size': 40, 'color': 'rgba(0,0,0,0)'},
+        hoverinfo='none',
+        showlegend=False
+    ))
 
-    df_barco = df_flota[df_flota['Barco_Normalizado'] == barco_seleccionado].copy()
-    if df_barco.empty:
-        return pd.DataFrame()
+    fig = go.Figure(trazas)
+    fig.update_layout(
+        height=ALTO_CELDA_GRILLA * filas,
+        margin=dict(l=6, r=6, t=6, b=6),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': "#ffffff", 'family': "Arial"},
+        xaxis={'range': [0, columnas], 'visible': False, 'fixedrange': True},
+        yaxis={'range': [0, filas], 'visible': False, 'fixedrange': True},
+        hovermode='closest',
+        hoverdistance=-1,
+        dragmode=False,
+        shapes=formas,
+        annotations=anotaciones
+    )
+
+    return fig
+
+
+def ordenar_barcos_por_alertas(barcos: List[str], conteo: Dict[str, int]) -> List[str]:
+    """Ordena los barcos por cantidad de alertas (mayor a menor), O(n log n)."""
+    return sorted(barcos, key=lambda barco: int(conteo.get(barco, 0)), reverse=True)
+
+
+def paginar_barcos(barcos_ordenados: List[str], pagina: Optional[int],
+                   por_pagina: int = BARCOS_POR_PAGINA) -> Tuple[List[str], int]:
+    """Retorna los barcos de la página solicitada y el total de páginas."""
+    total_paginas = max(1, -(-len(barcos_ordenados) // por_pagina))
+    pagina = min(max(1, int(pagina or 1)), total_paginas)
+    inicio = (pagina - 1) * por_pagina
+    return barcos_ordenados[inicio:inicio + por_pagina], total_paginas
+
+
+_BLOQUES_SPARKLINE = "▁▂▃▄▅▆▇█"
+
+
+def crear_sparkline(tendencia) -> html.Div:
+    """Sparkline de texto (bloques Unicode, sin Plotly) con la variación contra la hora anterior."""
+    tendencia = [int(v) for v in tendencia]
+    maximo = max(tendencia) or 1
+    niveles = len(_BLOQUES_SPARKLINE) - 1
+    barras = "".join(_BLOQUES_SPARKLINE[(v * niveles + maximo - 1) // maximo] for v in tendencia)
+    delta = tendencia[-1] - tendencia[-2] if len(tendencia) > 1 else 0
+    flecha = "▲" if delta > 0 else ("▼" if delta < 0 else "=")
 
-    if 'Activo' not in df_barco.columns:
-        df_barco['Activo'] = None
-    if 'Alerta' not in df_barco.columns:
-        df_barco['Alerta'] = None
+    return html.Div([
+        html.Div(barras, className="sparkline", title=f"Alertas por hora (últimas {len(tendencia)}h)"),
+        html.Div(f"{flecha} {delta:+d} vs hora anterior · {tendencia[-1]} última hora", className="sparkline-delta")
+    ], style={'textAlign': 'center'})
+
+
+def crear_tarjeta_velocimetro(barco: str, alertas: int, is_highlight: bool = False,
+                              equipo_alerta: Optional[str] = None, tendencia=None) -> html.Div:
+    """Crea la tarjeta clicable con el velocímetro de un barco (y su tendencia horaria, si hay)."""
+    fig = crear_velocimetro_24h(alertas, barco, max_valor=30)
+    mostrar_equipo = bool(is_highlight and equipo_alerta)
+
+    return html.Div(
+        [
+            html.H4(
+                barco,
+                className="barco-title",
+                style={
+                    'textAlign': 'center',
+                    'color': '#ecf0f1',
+                    'marginBottom': '2px',
+                    'fontSize': '18px'
+                }
+            ),
+            html.Div(
+                equipo_alerta if mostrar_equipo else "",
+                className="equipo-highlight",
+                style={
+                    'display': 'block' if mostrar_equipo else 'none'
+                }
+            ),
+            html.Div(
+                dcc.Graph(
+                    figure=fig,
+                    config={'displayModeBar': False},
+                    style={'width': '100%', 'height': '176px'}
+                ),
+                style={'width': '100%'}
+            ),
+            crear_sparkline(tendencia) if tendencia is not None else None
+        ],
+        id={'type': 'barco-card', 'index': barco},
+        n_clicks=0,
+        className=("gauge-card gauge-highlight" if is_highlight else "gauge-card"),
+        style={
+            'display': 'flex',
+            'flexDirection': 'column',
+            'justifyContent': 'flex-start',
+            'alignItems': 'center',
+            'margin': '0px 10px',
+        }
+    )
+
+
+def crear_tile_compacto(barco: str, alertas: int) -> html.Div:
+    """Crea un tile compacto (sin Plotly) para barcos con pocas alertas."""
+    _, color, _ = _estado_velocimetro(alertas)
+    return html.Div(
+        [
+            html.Span(barco, className="tile-nombre"),
+            html.Span(str(alertas), className="tile-valor", style={'color': color})
+        ],
+        id={'type': 'barco-card', 'index': barco},
+        n_clicks=0,
+        className="gauge-tile",
+        style={'borderColor': color}
+    )
+
+
+def agrupar_alertas_por_equipo(df_barco: pd.DataFrame) -> pd.DataFrame:
+    """Agrupa las alertas de un barco por equipo y tipo de alerta."""
+    if df_barco is None or df_barco.empty:
+        return pd.DataFrame()
 
-    df_barco['Activo'] = df_barco['Activo'].fillna('SIN ACTIVO').astype(str).str.strip()
-    df_barco['Alerta'] = df_barco['Alerta'].fillna('SIN ALERTA').astype(str).str.strip()
+    sin_columna = pd.Series(None, index=df_barco.index, dtype=object)
+    df_equipos = pd.DataFrame({
+        'Activo': columna_categorica(df_barco.get('Activo', sin_columna), 'SIN ACTIVO'),
+        'Alerta': columna_categorica(df_barco.get('Alerta', sin_columna), 'SIN ALERTA')
+    })
 
     df_agrupado = (
-        df_barco.groupby(['Activo', 'Alerta'])
+        df_equipos.groupby(['Activo', 'Alerta'], observed=True)
         .size()
         .reset_index(name='Cantidad')
         .sort_values('Cantidad', ascending=False)
+        .astype({'Activo': str, 'Alerta': str})
     )
     
     return df_agrupado
@@ -818,7 +1745,7 @@ def crear_grafico_barras_apilado(df_detalle: pd.DataFrame, barco_seleccionado: s
 
     fig = go.Figure()
     tipos_alerta = df_detalle['Alerta'].unique()
-    colors = px.colors.qualitative.Set3[:len(tipos_alerta)]
+    colors = PALETA_ALERTAS[:len(tipos_alerta)]
     equipos = df_detalle['Activo'].unique()
 
     for i, tipo in enumerate(tipos_alerta):
@@ -870,8 +1797,105 @@ def crear_grafico_barras_apilado(df_detalle: pd.DataFrame, barco_seleccionado: s
     return fig
 
 
-def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
-    """Crea una tabla HTML con el detalle de alertas por equipo."""
+def calcular_intervalos_equipos(df_barco: pd.DataFrame, ahora=None) -> pd.DataFrame:
+    """
+    Estadísticas de tiempo entre alertas por equipo de un barco: intervalo
+    medio y mediano, mayor silencio (incluido el tramo hasta ahora) y racha
+    actual (alertas seguidas a menos de UMBRAL_RACHA, si la última es reciente).
+    Se calcula ordenando (equipo, fecha) una vez y con np.diff sobre todo el barco.
+    """
+    if df_barco is None or df_barco.empty:
+        return pd.DataFrame()
+
+    equipos = columna_categorica(df_barco['Activo'], 'SIN ACTIVO')
+    codigos = equipos.cat.codes.to_numpy(np.int64)
+    fechas = df_barco['Fecha'].astype('int64').to_numpy()
+    ahora_ns = _fecha_a_ns(ahora if ahora is not None else ahora_local())
+    umbral = int(UMBRAL_RACHA.total_seconds() * 1e9)
+
+    orden = np.lexsort((fechas, codigos))
+    codigos, fechas = codigos[orden], fechas[orden]
+    n_equipos = len(equipos.cat.categories)
+
+    ultimo = np.r_[codigos[1:] != codigos[:-1], True]
+    mismo = ~ultimo[:-1]
+    grupo_gap = codigos[1:][mismo]
+    gaps = np.diff(fechas)[mismo]
+
+    cantidad_gaps = np.bincount(grupo_gap, minlength=n_equipos)
+    medio = np.bincount(grupo_gap, weights=gaps, minlength=n_equipos) / np.maximum(cantidad_gaps, 1)
+    mediano = pd.Series(gaps).groupby(grupo_gap).median().reindex(range(n_equipos)).to_numpy()
+    mayor_gap = np.zeros(n_equipos)
+    np.maximum.at(mayor_gap, grupo_gap, gaps)
+
+    # Silencio desde la última alerta de cada equipo hasta ahora
+    silencio_final = np.full(n_equipos, np.nan)
+    silencio_final[codigos[ultimo]] = ahora_ns - fechas[ultimo]
+    mayor_silencio = np.fmax(mayor_gap, silencio_final)
+
+    # Racha actual: tamaño del último tramo continuo (gaps <= umbral) de cada equipo
+    corte = np.r_[True, ~mismo | (np.diff(fechas) > umbral)]
+    tramo = np.cumsum(corte) - 1
+    tamano_tramo = np.bincount(tramo)
+    racha_tramo = np.zeros(n_equipos, dtype=np.int64)
+    racha_tramo[codigos[ultimo]] = tamano_tramo[tramo[ultimo]]
+    racha = np.where(silencio_final <= umbral, racha_tramo, 0)
+    ultima_alerta = np.zeros(n_equipos, dtype=np.int64)
+    ultima_alerta[codigos[ultimo]] = fechas[ultimo]
+
+    presentes = np.bincount(codigos, minlength=n_equipos) > 0
+    minutos = 60 * 1e9
+    return pd.DataFrame({
+        'Activo': [str(e) for e in equipos.cat.categories],
+        'Intervalo_Medio_Min': np.where(cantidad_gaps > 0, medio / minutos, np.nan),
+        'Intervalo_Mediano_Min': mediano / minutos,
+        'Mayor_Silencio_Min': mayor_silencio / minutos,
+        'Racha_Actual': racha,
+        # Base sin "ahora" para recalcular silencio y racha al servir (ver intervalos_al_momento)
+        'Mayor_Intervalo_Min': mayor_gap / minutos,
+        'Ultima_Alerta_Ns': ultima_alerta,
+        'Racha_Tramo': racha_tramo
+    })[presentes].round({'Intervalo_Medio_Min': 1, 'Intervalo_Mediano_Min': 1,
+                         'Mayor_Silencio_Min': 1, 'Mayor_Intervalo_Min': 1}).reset_index(drop=True)
+
+
+def intervalos_al_momento(intervalos: List[Dict], ahora=None) -> List[Dict]:
+    """
+    Recalcula los campos que dependen de la hora actual (mayor silencio y
+    racha actual) sobre registros de calcular_intervalos_equipos. El detalle
+    se cachea por versión de datos, pero el silencio sigue creciendo entre
+    versiones; por eso estos dos campos se resuelven al servir.
+    """
+    if not intervalos:
+        return []
+    ahora_ns = _fecha_a_ns(ahora if ahora is not None else ahora_local())
+    umbral = int(UMBRAL_RACHA.total_seconds() * 1e9)
+    resultado = []
+    for registro in intervalos:
+        ultima = registro.get('Ultima_Alerta_Ns')
+        if ultima is None:
+            resultado.append(registro)
+            continue
+        silencio = ahora_ns - int(ultima)
+        mayor = registro.get('Mayor_Intervalo_Min') or 0.0
+        resultado.append({
+            **registro,
+            'Mayor_Silencio_Min': round(max(mayor, silencio / (60 * 1e9)), 1),
+            'Racha_Actual': int(registro.get('Racha_Tramo') or 0) if silencio <= umbral else 0
+        })
+    return resultado
+
+
+def _formatear_minutos(minutos: float) -> str:
+    if minutos is None or pd.isna(minutos):
+        return "—"
+    if minutos < 60:
+        return f"{minutos:.0f} min"
+    return f"{int(minutos // 60)}h {int(minutos % 60):02d}m"
+
+
+def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame, df_intervalos: Optional[pd.DataFrame] = None) -> html.Div:
+    """Crea una tabla HTML con el detalle de alertas por equipo (e intervalos entre alertas, si hay)."""
     if df_detalle.empty:
         return html.Div([
             html.P(
@@ -882,6 +1906,9 @@ def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
 
     df_detalle = df_detalle.sort_values(['Activo', 'Cantidad'], ascending=[True, False])
     equipos_unicos = df_detalle['Activo'].unique()
+    intervalos = {}
+    if df_intervalos is not None and not df_intervalos.empty:
+        intervalos = df_intervalos.set_index('Activo').to_dict('index')
 
     filas = []
     for equipo in equipos_unicos:
@@ -890,8 +1917,8 @@ def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
 
         badges = []
         for _, row in datos_equipo.iterrows():
-            color_idx = hash(row['Alerta']) % len(px.colors.qualitative.Set3)
-            color = px.colors.qualitative.Set3[color_idx]
+            color_idx = hash(row['Alerta']) % len(PALETA_ALERTAS)
+            color = PALETA_ALERTAS[color_idx]
             badges.append(
                 html.Span(
                     f"{row['Alerta']}: {int(row['Cantidad'])}",
@@ -908,7 +1935,8 @@ def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
             ),
             html.Td(
                 html.Div(badges, style={'display': 'flex', 'flexWrap': 'wrap', 'gap': '5px'})
-            )
+            ),
+            html.Td(crear_celda_intervalos(intervalos.get(equipo)), style={'fontSize': '12px', 'color': '#bdc3c7'})
         ]))
 
     return html.Div([
@@ -919,9 +1947,10 @@ def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
         html.Table([
             html.Thead(
                 html.Tr([
-                    html.Th("Equipo", style={'width': '30%'}),
-                    html.Th("Total Alertas (24h)", style={'width': '20%', 'textAlign': 'center'}),
-                    html.Th("Distribución por Tipo", style={'width': '50%'})
+                    html.Th("Equipo", style={'width': '22%'}),
+                    html.Th("Total Alertas (24h)", style={'width': '13%', 'textAlign': 'center'}),
+                    html.Th("Distribución por Tipo", style={'width': '35%'}),
+                    html.Th("Intervalos entre Alertas", style={'width': '30%'})
                 ])
             ),
             html.Tbody(filas)
@@ -929,32 +1958,1778 @@ def crear_tabla_equipos_detallada(df_detalle: pd.DataFrame) -> html.Div:
     ], className="equipo-details")
 
 
-def obtener_equipo_mas_reciente_por_barco(df_raw_local: pd.DataFrame, barco: str) -> Optional[str]:
-    """Obtiene el equipo con la alerta más reciente para un barco específico."""
-    try:
-        if df_raw_local is None or df_raw_local.empty:
-            return None
+def crear_celda_intervalos(intervalo: Optional[Dict]) -> html.Div:
+    """Resumen de intervalos entre alertas de un equipo para la tabla de detalle."""
+    if not intervalo:
+        return html.Div("—")
 
-        df_flota, _ = preparar_df_flota_24h(df_raw_local)
-        if df_flota.empty:
+    racha = int(intervalo.get('Racha_Actual', 0))
+    return html.Div([
+        html.Div(f"Medio: {_formatear_minutos(intervalo.get('Intervalo_Medio_Min'))} · "
+                 f"Mediana: {_formatear_minutos(intervalo.get('Intervalo_Mediano_Min'))}"),
+        html.Div(f"Mayor silencio: {_formatear_minutos(intervalo.get('Mayor_Silencio_Min'))}"),
+        html.Div(
+            f"🔥 Racha actual: {racha}" if racha > 1 else "Sin racha activa",
+            style={'color': '#e67e22' if racha > 1 else '#95a5a6'}
+        )
+    ])
+
+
+# ============================================================================
+# CACHE EN MEMORIA (LRU POR TAMAÑO) Y NIVEL ARROW EN DISCO
+# ============================================================================
+
+_cache_memoria: "OrderedDict[Tuple, Dict]" = OrderedDict()
+_cache_memoria_lock = threading.Lock()
+
+
+def _tamano_aproximado(obj, profundidad: int = 6) -> int:
+    """Bytes aproximados de una estructura (DataFrames, arrays, figuras, dicts, listas y texto)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    if profundidad == 0:
+        return 64
+    if isinstance(obj, go.Figure):
+        return _tamano_aproximado(obj.to_plotly_json(), profundidad - 1)
+    if isinstance(obj, dict):
+        return sum(_tamano_aproximado(k, 0) + _tamano_aproximado(v, profundidad - 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(_tamano_aproximado(v, profundidad - 1) for v in obj)
+    return 64
+
+
+def _ruta_cache_disco(clave: Tuple) -> str:
+    nombre = hashlib.blake2b(repr(clave).encode('utf-8'), digest_size=12).hexdigest()
+    return os.path.join(RUTA_CACHE_DISCO, f"{clave[0]}-{nombre}.arrow")
+
+
+def _guardar_cache_disco(clave: Tuple, df: pd.DataFrame) -> None:
+    """Escribe un DataFrame como Arrow IPC (Feather v2) y poda los archivos más viejos."""
+    try:
+        os.makedirs(RUTA_CACHE_DISCO, exist_ok=True)
+        ruta = _ruta_cache_disco(clave)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), temporal, compression='zstd')
+        os.replace(temporal, ruta)
+
+        archivos = sorted(
+            (os.path.join(RUTA_CACHE_DISCO, n) for n in os.listdir(RUTA_CACHE_DISCO) if n.endswith('.arrow')),
+            key=os.path.getmtime
+        )
+        for viejo in archivos[:-MAX_ARCHIVOS_CACHE_DISCO]:
+            os.remove(viejo)
+    except (OSError, pa.ArrowException) as e:
+        print(f"Error escribiendo cache en disco: {e}")
+
+
+def _leer_cache_disco(clave: Tuple) -> Optional[pd.DataFrame]:
+    ruta = _ruta_cache_disco(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        return feather.read_table(ruta, memory_map=True).to_pandas()
+    except (OSError, pa.ArrowException) as e:
+        print(f"Error leyendo cache en disco: {e}")
+        return None
+
+
+def _podar_cache_memoria() -> None:
+    """Expulsa las entradas menos usadas hasta quedar bajo LIMITE_CACHE_MB."""
+    limite = LIMITE_CACHE_MB * 1024 ** 2
+    total = sum(e['tamano'] for e in _cache_memoria.values())
+    while total > limite and len(_cache_memoria) > 1:
+        _, entrada = _cache_memoria.popitem(last=False)
+        total -= entrada['tamano']
+
+
+def cache_guardar(clave: Tuple, valor, disco: bool = False, tamano: Optional[int] = None):
+    """
+    Guarda un valor bajo una clave (tipo, versión, ...). Con `disco`, un
+    DataFrame se escribe también en el nivel Arrow para otros procesos o
+    reinicios. El tamaño se mide una sola vez (o se pasa en `tamano`); lo
+    que el valor crezca después se suma con cache_sumar_tamano.
+    """
+    tamano = _tamano_aproximado(valor) if tamano is None else tamano
+    with _cache_memoria_lock:
+        _cache_memoria[clave] = {'valor': valor, 'tamano': tamano}
+        _cache_memoria.move_to_end(clave)
+        _podar_cache_memoria()
+    if disco and RUTA_CACHE_DISCO and isinstance(valor, pd.DataFrame):
+        _guardar_cache_disco(clave, valor)
+    return valor
+
+
+def cache_sumar_tamano(clave: Tuple, valor, bytes_extra: int) -> None:
+    """
+    Suma bytes a una entrada que creció después de guardarse (un detalle que
+    terminó de calcularse, un cuerpo comprimido) y poda si hace falta. No
+    hace nada si la entrada ya fue expulsada o reemplazada por otro valor.
+    """
+    with _cache_memoria_lock:
+        entrada = _cache_memoria.get(clave)
+        if entrada is None or entrada['valor'] is not valor:
+            return
+        entrada['tamano'] += bytes_extra
+        _podar_cache_memoria()
+
+
+def cache_obtener(clave: Tuple, disco: bool = False):
+    """Busca en memoria y, con `disco`, en el nivel Arrow (promoviendo el valor a memoria)."""
+    with _cache_memoria_lock:
+        entrada = _cache_memoria.get(clave)
+        if entrada is not None:
+            _cache_memoria.move_to_end(clave)
+            return entrada['valor']
+
+    if disco and RUTA_CACHE_DISCO:
+        df = _leer_cache_disco(clave)
+        if df is not None:
+            return cache_guardar(clave, df)
+    return None
+
+
+def cache_limpiar(conservar: Optional[str] = None) -> int:
+    """Vacía la cache en memoria salvo las claves de la versión `conservar`; retorna las expulsadas."""
+    with _cache_memoria_lock:
+        claves = [c for c in _cache_memoria if conservar is None or conservar not in c]
+        for clave in claves:
+            del _cache_memoria[clave]
+    return len(claves)
+
+
+def resumen_cache() -> Dict[str, Dict]:
+    """Entradas y MB por tipo de clave."""
+    resumen: Dict[str, Dict] = {}
+    with _cache_memoria_lock:
+        for clave, entrada in _cache_memoria.items():
+            tipo = resumen.setdefault(f"cache_{clave[0]}", {'elementos': 0, 'mb': 0.0})
+            tipo['elementos'] += 1
+            tipo['mb'] += entrada['tamano'] / 1024 ** 2
+    return {tipo: {'elementos': v['elementos'], 'mb': round(v['mb'], 3)} for tipo, v in resumen.items()}
+
+
+# ============================================================================
+# PRECÁLCULO DE DETALLES POR BARCO
+# ============================================================================
+
+_ejecutor_detalles = ThreadPoolExecutor(max_workers=HILOS_DETALLE, thread_name_prefix="detalle-barco")
+_detalles_lock = threading.Lock()
+
+
+def calcular_version_datos(df_flota: pd.DataFrame) -> str:
+    """Calcula una huella estable del snapshot procesado de la flota (ventana 24h)."""
+    if df_flota is None or df_flota.empty:
+        return "vacio"
+
+    columnas = [c for c in ('Fecha', 'Area', 'Activo', 'Alerta', 'Barco_Normalizado') if c in df_flota.columns]
+    huellas = np.sort(pd.util.hash_pandas_object(df_flota[columnas], index=False).to_numpy())
+    return hashlib.blake2b(huellas.tobytes(), digest_size=8).hexdigest()
+
+
+def construir_detalle_barco(df_barco: pd.DataFrame, barco: str) -> Dict:
+    """Construye el payload serializable del detalle de un barco (figura, estadísticas, tabla e intervalos)."""
+    return construir_payload_detalle(agrupar_alertas_por_equipo(df_barco), barco, calcular_intervalos_equipos(df_barco))
+
+
+def construir_payload_detalle(df_detalle: pd.DataFrame, barco: str, df_intervalos: Optional[pd.DataFrame] = None) -> Dict:
+    """Construye el payload de detalle a partir de las alertas ya agrupadas por equipo."""
+    if df_detalle.empty:
+        return {'barco': barco, 'vacio': True}
+
+    intervalos = []
+    if df_intervalos is not None and not df_intervalos.empty:
+        intervalos = df_intervalos.astype(object).where(df_intervalos.notna(), None).to_dict('records')
+
+    return {
+        'barco': barco,
+        'vacio': False,
+        'figura': crear_grafico_barras_apilado(df_detalle, barco).to_dict(),
+        'estadisticas': {
+            'total_alertas': int(df_detalle['Cantidad'].sum()),
+            'equipos_afectados': int(df_detalle['Activo'].nunique()),
+            'tipos_alerta': int(df_detalle['Alerta'].nunique())
+        },
+        'tabla': df_detalle.to_dict('records'),
+        'intervalos': intervalos
+    }
+
+
+def precalcular_detalles_flota(version: str, df_flota: pd.DataFrame) -> None:
+    """Lanza en segundo plano el cálculo del detalle de cada barco para una versión de datos."""
+    with _detalles_lock:
+        if cache_obtener(('detalles', version)) is not None:
+            return
+
+        grupos = {}
+        if not df_flota.empty:
+            grupos = dict(tuple(df_flota.groupby('Barco_Normalizado', sort=False, observed=True)))
+
+        futuros = {
+            barco: _ejecutor_detalles.submit(construir_detalle_barco, grupos.get(barco), barco)
+            for barco in obtener_barcos_flota()
+        }
+        clave = ('detalles', version)
+        cache_guardar(clave, futuros, tamano=64 * len(futuros))
+
+        # Cada detalle se mide una vez, al terminar (o ya, si terminó antes de registrar el callback)
+        def medir(futuro):
+            if not futuro.cancelled() and futuro.exception() is None:
+                cache_sumar_tamano(clave, futuros, _tamano_aproximado(futuro.result()))
+
+        for futuro in futuros.values():
+            futuro.add_done_callback(medir)
+
+
+def obtener_detalle_cacheado(version: Optional[str], barco: str, timeout: float = 5.0) -> Optional[Dict]:
+    """
+    Busca el detalle precalculado de un barco. Si esta versión no está en
+    memoria (otro worker o un reinicio) pero su ventana está en el nivel
+    Arrow en disco, se recalculan los detalles desde ahí. None si no hay.
+    """
+    if not version:
+        return None
+
+    futuros = cache_obtener(('detalles', version))
+    if futuros is None:
+        df_flota = cache_obtener(('ventana', version), disco=True)
+        if df_flota is None:
             return None
+        precalcular_detalles_flota(version, df_flota)
+        futuros = cache_obtener(('detalles', version)) or {}
+
+    futuro = futuros.get(barco)
+    if futuro is None:
+        return None
+
+    try:
+        return futuro.result(timeout=timeout)
+    except Exception as e:
+        print(f"Error en detalle precalculado de {barco}: {e}")
+        return None
+
+
+def crear_contenido_detalle(barco_seleccionado: str, detalle: Dict) -> html.Div:
+    """Crea el contenido de la sidebar derecha a partir del payload de detalle."""
+    if not detalle or detalle.get('vacio', True):
+        return html.Div([
+            html.H5(
+                f"{barco_seleccionado}",
+                style={
+                    'color': '#2ecc71',
+                    'marginBottom': '15px',
+                    'fontSize': '20px'
+                }
+            ),
+            html.P(
+                f"No hay alertas registradas para {barco_seleccionado} en las últimas 24 horas.",
+                style={
+                    'color': '#bdc3c7',
+                    'textAlign': 'center',
+                    'padding': '30px',
+                    'fontSize': '16px'
+                }
+            )
+        ])
+
+    estadisticas = detalle['estadisticas']
+    tabla_detallada = crear_tabla_equipos_detallada(
+        pd.DataFrame.from_records(detalle['tabla']),
+        pd.DataFrame.from_records(intervalos_al_momento(detalle.get('intervalos', [])))
+    )
+
+    return html.Div([
+        html.H5(
+            f"{barco_seleccionado}",
+            style={
+                'color': '#2ecc71',
+                'marginBottom': '20px',
+                'fontSize': '24px',
+                'textAlign': 'center'
+            }
+        ),
+        html.Div([
+            html.H6(
+                "Resumen de Alertas (Últimas 24 horas)",
+                style={
+                    'color': '#2ecc71',
+                    'marginBottom': '15px',
+                    'fontSize': '18px'
+                }
+            ),
+            html.Div([
+                html.Div([
+                    html.Div(str(estadisticas['total_alertas']), className="stat-value"),
+                    html.Div("Total Alertas", className="stat-label")
+                ], className="stat-item"),
+                html.Div([
+                    html.Div(str(estadisticas['equipos_afectados']), className="stat-value"),
+                    html.Div("Equipos Afectados", className="stat-label")
+                ], className="stat-item"),
+                html.Div([
+                    html.Div(str(estadisticas['tipos_alerta']), className="stat-value"),
+                    html.Div("Tipos de Alerta", className="stat-label")
+                ], className="stat-item"),
+            ], className="stats-grid")
+        ], className="alertas-resumen"),
+
+        html.Hr(style={'borderColor': '#2c3e50', 'margin': '20px 0'}),
+
+        dcc.Graph(
+            figure=detalle['figura'],
+            config={
+                'displayModeBar': True,
+                'displaylogo': False,
+                'responsive': True
+            },
+            className="graph-container"
+        ),
+
+        html.Hr(style={'borderColor': '#2c3e50', 'margin': '25px 0'}),
+
+        tabla_detallada
+    ])
+
+
+# ============================================================================
+# ALMACÉN LOCAL DE ALERTAS (SQLite)
+# ============================================================================
+
+_ESQUEMA_ALERTAS = """
+CREATE TABLE IF NOT EXISTS alertas (
+    id INTEGER PRIMARY KEY,
+    fecha INTEGER NOT NULL,
+    barco TEXT,
+    flota TEXT,
+    area TEXT NOT NULL,
+    activo TEXT,
+    alerta TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_barco_fecha ON alertas (barco, fecha);
+CREATE INDEX IF NOT EXISTS idx_alertas_fecha ON alertas (fecha);
+CREATE TABLE IF NOT EXISTS eventos (
+    version TEXT PRIMARY KEY,
+    creado INTEGER NOT NULL,
+    nuevas TEXT NOT NULL,
+    marca TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_creado ON eventos (creado);
+"""
+
+_conexiones_store = threading.local()
+_escritura_store_lock = threading.Lock()
+_store_sincronizado = {'historial': False}
+
+
+def conexion_store() -> sqlite3.Connection:
+    """Retorna la conexión SQLite del hilo actual (modo WAL), creándola si no existe."""
+    conexion = getattr(_conexiones_store, 'conexion', None)
+    if conexion is None:
+        os.makedirs(os.path.dirname(RUTA_ALERTAS_DB) or '.', exist_ok=True)
+        conexion = sqlite3.connect(RUTA_ALERTAS_DB, timeout=30, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.executescript(_ESQUEMA_ALERTAS)
+        _conexiones_store.conexion = conexion
+    return conexion
+
+
+def calcular_hash_filas(df: pd.DataFrame) -> np.ndarray:
+    """Hash estable (int64) de cada alerta sobre (Fecha, Area, Activo, Alerta), vectorizado."""
+    columnas = pd.DataFrame({
+        'Fecha': df['Fecha'],
+        'Area': df['Area'],
+        'Activo': df['Activo'] if 'Activo' in df.columns else 'SIN ACTIVO',
+        'Alerta': df['Alerta'] if 'Alerta' in df.columns else 'SIN ALERTA'
+    })
+    return pd.util.hash_pandas_object(columnas, index=False).to_numpy().view(np.int64)
+
+
+def _fecha_a_ns(fecha) -> int:
+    """Convierte un datetime (con o sin zona) a nanosegundos epoch UTC."""
+    fecha = pd.Timestamp(fecha)
+    if fecha.tzinfo is None:
+        fecha = fecha.tz_localize(ZONA_HORARIA)
+    return int(fecha.value)
+
+
+def guardar_alertas_store(df_flota: pd.DataFrame) -> pd.DataFrame:
+    """Inserta las alertas en el almacén local ignorando duplicados; retorna las filas nuevas."""
+    if df_flota is None or df_flota.empty:
+        return pd.DataFrame()
+
+    hashes = df_flota['Id'].to_numpy() if 'Id' in df_flota.columns else calcular_hash_filas(df_flota)
+    fechas_ns = df_flota['Fecha'].astype('int64').to_numpy()
+
+    with _escritura_store_lock:
+        conexion = conexion_store()
+        existentes = np.fromiter(
+            (fila[0] for fila in conexion.execute(
+                "SELECT id FROM alertas WHERE fecha BETWEEN ? AND ?", (int(fechas_ns.min()), int(fechas_ns.max()))
+            )),
+            dtype=np.int64
+        )
+        es_nueva = ~np.isin(hashes, existentes) & ~pd.Series(hashes).duplicated().to_numpy()
+        if not es_nueva.any():
+            return df_flota.iloc[0:0]
+
+        df_nuevas = df_flota[es_nueva].assign(Id=hashes[es_nueva])
+        with conexion:
+            conexion.executemany(
+                "INSERT OR IGNORE INTO alertas (id, fecha, barco, flota, area, activo, alerta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _filas_store(df_nuevas, fechas_ns[es_nueva])
+            )
+    return df_nuevas
+
+
+def _filas_store(df: pd.DataFrame, fechas_ns: np.ndarray):
+    """Tuplas (id, fecha, barco, flota, area, activo, alerta) para insertar en SQLite."""
+    return zip(
+        df['Id'].tolist(),
+        fechas_ns.tolist(),
+        df['Barco_Normalizado'].astype(object).where(df['Barco_Normalizado'].notna(), None).tolist(),
+        df['Flota'].astype(object).where(df['Flota'].notna(), None).tolist(),
+        df['Area'].astype(str).tolist(),
+        df['Activo'].astype(str).tolist() if 'Activo' in df.columns else repeat('SIN ACTIVO'),
+        df['Alerta'].astype(str).tolist() if 'Alerta' in df.columns else repeat('SIN ALERTA')
+    )
+
+
+def sincronizar_store(df_raw_local: pd.DataFrame, df_flota: pd.DataFrame) -> pd.DataFrame:
+    """
+    Guarda las alertas de la flota en el almacén local y en el histórico Parquet.
+
+    La primera vez en el proceso se guarda todo el historial del sheet, incluidas
+    las filas que la retención ya sacó de memoria; después basta con la ventana
+    de 24h ya procesada (los duplicados se ignoran).
+    Retorna las filas que no existían en el almacén.
+    """
+    try:
+        if not _store_sincronizado['historial']:
+            df, _ = normalizar_esquema_ingesta(historial_sin_retencion(df_raw_local))
+            df_nuevas = guardar_alertas_store(identificar_flota(df)) if not df.empty else pd.DataFrame()
+            _store_sincronizado['historial'] = True
+            with _historial_pendiente_lock:
+                _historial_pendiente.clear()
+        else:
+            df_nuevas = guardar_alertas_store(df_flota)
+    except sqlite3.Error as e:
+        print(f"Error guardando alertas en el almacén local: {e}")
+        return pd.DataFrame()
+
+    try:
+        escribir_historico_parquet(df_nuevas)
+        iniciar_compactacion_historico()
+    except (OSError, pa.ArrowException) as e:
+        print(f"Error escribiendo histórico Parquet: {e}")
+
+    return df_nuevas
+
+
+def leer_ventana_store(desde, hasta=None) -> pd.DataFrame:
+    """Lee del almacén local las alertas de la flota en [desde, hasta) con el esquema de df_flota."""
+    consulta = "SELECT id, fecha, area, activo, alerta, barco, flota FROM alertas WHERE fecha >= ?"
+    parametros = [_fecha_a_ns(desde)]
+    if hasta is not None:
+        consulta += " AND fecha < ?"
+        parametros.append(_fecha_a_ns(hasta))
+
+    filas = conexion_store().execute(consulta + " ORDER BY fecha", parametros).fetchall()
+    if not filas:
+        return pd.DataFrame()
+
+    id_, fecha, area, activo, alerta, barco, flota = zip(*filas)
+    return pd.DataFrame({
+        'Id': np.array(id_, dtype=np.int64),
+        'Fecha': pd.to_datetime(np.array(fecha, dtype=np.int64), utc=True).tz_convert(ZONA_HORARIA),
+        'Area': pd.Categorical(area),
+        'Activo': pd.Categorical(activo),
+        'Alerta': pd.Categorical(alerta),
+        'Barco_Normalizado': pd.Categorical(barco),
+        'Flota': pd.Categorical(flota)
+    })
+
+
+def iterar_alertas_store(desde, barco: Optional[str] = None, tamano: int = FILAS_BLOQUE_EXPORTACION):
+    """
+    Recorre por bloques (fetchmany) las alertas desde una fecha, de un barco
+    o de toda la flota, ordenadas por fecha. Usa los índices (barco, fecha)
+    y (fecha); nunca carga la ventana completa en memoria.
+    Cada bloque es una lista de tuplas (fecha_ns, barco, flota, area, activo, alerta).
+    """
+    consulta = "SELECT fecha, barco, flota, area, activo, alerta FROM alertas WHERE fecha >= ?"
+    parametros = [_fecha_a_ns(desde)]
+    if barco is not None:
+        consulta += " AND barco = ?"
+        parametros.append(barco)
+
+    cursor = conexion_store().execute(consulta + " ORDER BY fecha", parametros)
+    try:
+        while True:
+            bloque = cursor.fetchmany(tamano)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        cursor.close()
+
+
+def contar_alertas_store(desde, debug: List[str]) -> Tuple[Dict[str, int], int, List[str]]:
+    """
+    Igual que contar_alertas_por_barco, pero con una consulta agrupada sobre
+    el índice por fecha del almacén (sin pasar por pandas).
+    """
+    filas = conexion_store().execute(
+        "SELECT barco, COUNT(*) FROM alertas WHERE fecha >= ? GROUP BY barco",
+        (_fecha_a_ns(desde),)
+    ).fetchall()
+    conteo_por_barco = {barco: 0 for barco in obtener_barcos_flota()}
+    alertas_sin_barco_local = 0
+    for barco, cantidad in filas:
+        if barco is None:
+            alertas_sin_barco_local = int(cantidad)
+        elif barco in conteo_por_barco:
+            conteo_por_barco[barco] = int(cantidad)
+
+    total_identificadas = sum(conteo_por_barco.values())
+    debug.append(f"📝 Con barco identificado: {total_identificadas}")
+    debug.append(f"⚠️ Sin barco identificado: {alertas_sin_barco_local}")
+    debug.append(f"✅ Total alertas (24h): {total_identificadas + alertas_sin_barco_local}")
+    return conteo_por_barco, alertas_sin_barco_local, debug
+
+
+def detalle_barco_store(barco: str, desde) -> pd.DataFrame:
+    """Alertas de un barco agrupadas por equipo y tipo (índice barco, fecha)."""
+    filas = conexion_store().execute(
+        "SELECT activo, alerta, COUNT(*) AS cantidad FROM alertas "
+        "WHERE barco = ? AND fecha >= ? GROUP BY activo, alerta ORDER BY cantidad DESC",
+        (barco, _fecha_a_ns(desde))
+    ).fetchall()
+    return pd.DataFrame(filas, columns=['Activo', 'Alerta', 'Cantidad'])
+
+
+# ============================================================================
+# EVENTOS DE ALERTAS NUEVAS (COMPARTIDOS ENTRE PANTALLAS)
+# ============================================================================
+
+_eventos_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_eventos_lock = threading.Lock()
+
+
+def _evento_desde_fila(fila: Tuple) -> Dict:
+    """Convierte una fila (version, creado, nuevas, marca) de la tabla eventos."""
+    version, creado, nuevas, marca = fila
+    return {'version': version, 'creado': int(creado), 'nuevas': json.loads(nuevas), 'marca': json.loads(marca)}
+
+
+def _cachear_evento(evento: Dict) -> Dict:
+    _eventos_cache[evento['version']] = evento
+    while len(_eventos_cache) > MAX_EVENTOS_CACHE:
+        _eventos_cache.popitem(last=False)
+    return evento
+
+
+def registrar_evento_version(version: str, df_flota: pd.DataFrame, anomalias: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Calcula una sola vez por versión de datos las alertas nuevas respecto
+    al último evento registrado (más las anomalías de tasa, si hay) y lo
+    persiste en SQLite. Otras pantallas, workers o reinicios reutilizan el
+    mismo evento.
+    """
+    with _eventos_lock:
+        if version in _eventos_cache:
+            return _eventos_cache[version]
+
+        conexion = conexion_store()
+        consulta = "SELECT version, creado, nuevas, marca FROM eventos"
+        fila = conexion.execute(consulta + " WHERE version = ?", (version,)).fetchone()
+        if fila:
+            return _cachear_evento(_evento_desde_fila(fila))
+
+        # Sin eventos previos (almacén nuevo) todo se toma como línea base
+        ultimo = conexion.execute(consulta + " ORDER BY creado DESC LIMIT 1").fetchone()
+        marca_previa = _evento_desde_fila(ultimo)['marca'] if ultimo else None
+        df_nuevas, marca = detectar_filas_nuevas(df_flota, marca_previa)
+        nuevas = resumir_alertas_nuevas(df_nuevas)
+        for barco, info in (anomalias or {}).items():
+            nuevas.setdefault(barco, {'cantidad': 0, 'equipo': info.get('equipo')})['anomalia'] = info
+
+        with _escritura_store_lock, conexion:
+            conexion.execute(
+                "INSERT OR IGNORE INTO eventos (version, creado, nuevas, marca) VALUES (?, ?, ?, ?)",
+                (version, time.time_ns(), json.dumps(nuevas), json.dumps(marca))
+            )
+            conexion.execute(
+                "DELETE FROM eventos WHERE creado < ?",
+                (time.time_ns() - int(RETENCION_EVENTOS.total_seconds() * 1e9),)
+            )
+        # Si otro proceso registró la misma versión primero, prevalece su evento
+        fila = conexion.execute(consulta + " WHERE version = ?", (version,)).fetchone()
+        return _cachear_evento(_evento_desde_fila(fila))
+
+
+def _buscar_evento(version: Optional[str]) -> Optional[Dict]:
+    """Evento de una versión: de la cache del proceso o de la tabla eventos (otro worker o un reinicio)."""
+    if not version:
+        return None
+    with _eventos_lock:
+        if version in _eventos_cache:
+            return _eventos_cache[version]
+    fila = conexion_store().execute(
+        "SELECT version, creado, nuevas, marca FROM eventos WHERE version = ?", (version,)
+    ).fetchone()
+    if fila is None:
+        return None
+    with _eventos_lock:
+        return _cachear_evento(_evento_desde_fila(fila))
+
+
+def nuevas_para_cliente(version_previa: Optional[str], version_actual: str) -> Dict[str, Dict]:
+    """
+    Une las alertas nuevas de los eventos posteriores a la versión que ya
+    mostró el cliente. La secuencia sale de la tabla eventos (orden por
+    `creado`), así que incluye los registrados por otros workers. Una
+    pantalla recién abierta (o con una versión ya purgada) recibe el último
+    evento solo si está dentro de VIGENCIA_EVENTO.
+    """
+    actual = _buscar_evento(version_actual)
+    if actual is None or version_previa == version_actual:
+        return {}
+
+    previo = _buscar_evento(version_previa)
+    if previo is not None:
+        if previo['creado'] >= actual['creado']:
+            return {}
+        filas = conexion_store().execute(
+            "SELECT version, creado, nuevas, marca FROM eventos WHERE creado > ? AND creado <= ? ORDER BY creado",
+            (previo['creado'], actual['creado'])
+        ).fetchall()
+        pendientes = [_evento_desde_fila(fila) for fila in filas]
+    else:
+        vigente = time.time_ns() - int(VIGENCIA_EVENTO.total_seconds() * 1e9)
+        pendientes = [actual] if actual['creado'] >= vigente else []
+
+    nuevas: Dict[str, Dict] = {}
+    for evento in pendientes:
+        for barco, info in evento['nuevas'].items():
+            previo = nuevas.get(barco, {'cantidad': 0})
+            nuevas[barco] = {
+                'cantidad': previo['cantidad'] + info['cantidad'],
+                'equipo': info.get('equipo') or previo.get('equipo'),
+                'anomalia': info.get('anomalia') or previo.get('anomalia')
+            }
+    return nuevas
+
+
+# ============================================================================
+# HISTÓRICO PARQUET PARTICIONADO POR DÍA
+# ============================================================================
+# Archivo de largo plazo para análisis fuera del dashboard (pyarrow.dataset o
+# pandas con particiones hive). El dashboard lee siempre del almacén SQLite,
+# que es la fuente completa: backfill.py --sin-historico solo carga el almacén.
+
+_ESQUEMA_HISTORICO = pa.schema([
+    ('id', pa.int64()),
+    ('fecha', pa.timestamp('ns', tz='UTC')),
+    ('barco', pa.dictionary(pa.int32(), pa.string())),
+    ('flota', pa.dictionary(pa.int32(), pa.string())),
+    ('area', pa.dictionary(pa.int32(), pa.string())),
+    ('activo', pa.dictionary(pa.int32(), pa.string())),
+    ('alerta', pa.dictionary(pa.int32(), pa.string())),
+])
+
+_compactacion = {'hilo': None}
+_compactacion_lock = threading.Lock()
+
+
+def _directorio_particion(dia) -> str:
+    return os.path.join(RUTA_HISTORICO, f"fecha={dia:%Y-%m-%d}")
+
+
+def escribir_historico_parquet(df_nuevas: pd.DataFrame) -> int:
+    """Escribe las alertas nuevas como archivos parciales en la partición de su día local."""
+    if df_nuevas is None or df_nuevas.empty:
+        return 0
+
+    columnas = pd.DataFrame({
+        'id': df_nuevas['Id'].to_numpy(),
+        'fecha': df_nuevas['Fecha'].dt.tz_convert('UTC'),
+        'barco': df_nuevas['Barco_Normalizado'].astype('category'),
+        'flota': df_nuevas['Flota'].astype('category'),
+        'area': df_nuevas['Area'].astype('category'),
+        'activo': df_nuevas.get('Activo', pd.Series('SIN ACTIVO', index=df_nuevas.index)).astype('category'),
+        'alerta': df_nuevas.get('Alerta', pd.Series('SIN ALERTA', index=df_nuevas.index)).astype('category'),
+    })
+    dias = df_nuevas['Fecha'].dt.date
+
+    archivos = 0
+    sello = f"{time.time_ns()}-{threading.get_ident()}"
+    for dia, df_dia in columnas.groupby(dias.to_numpy(), sort=False):
+        directorio = _directorio_particion(dia)
+        os.makedirs(directorio, exist_ok=True)
+        tabla = pa.Table.from_pandas(df_dia, schema=_ESQUEMA_HISTORICO, preserve_index=False)
+        # Nombre temporal + os.replace: lectores y compactación nunca ven un archivo a medio escribir
+        parte = os.path.join(directorio, f"parte-{sello}.parquet")
+        pq.write_table(tabla, parte + '.tmp')
+        os.replace(parte + '.tmp', parte)
+        archivos += 1
+    return archivos
+
+
+def _reclamar_particion(reclamo: str) -> bool:
+    """
+    Solo un proceso (maestro, worker o backfill.py) compacta un día a la vez:
+    el que crea el archivo de reclamo. Un reclamo abandonado se descarta
+    después de VIGENCIA_RECLAMO_COMPACTACION.
+    """
+    try:
+        os.close(os.open(reclamo, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(reclamo) > VIGENCIA_RECLAMO_COMPACTACION:
+            os.remove(reclamo)
+    except OSError:
+        pass
+    return False
+
+
+def compactar_particion(directorio: str) -> bool:
+    """Une los archivos parciales de un día en un único archivo sin duplicados."""
+    reclamo = os.path.join(directorio, 'compactando.reclamo')
+    if not _reclamar_particion(reclamo):
+        return False
+
+    try:
+        partes = sorted(
+            e.path for e in os.scandir(directorio)
+            if e.name.startswith('parte-') and e.name.endswith('.parquet')
+        )
+        compactado = os.path.join(directorio, 'compactado.parquet')
+        if not partes:
+            return False
+
+        archivos = ([compactado] if os.path.exists(compactado) else []) + partes
+        tabla = pa.concat_tables(
+            [pq.ParquetFile(a, memory_map=True).read() for a in archivos],
+            promote_options='permissive'
+        )
+        df = tabla.to_pandas().drop_duplicates('id').sort_values('fecha')
+        tabla = pa.Table.from_pandas(df, schema=_ESQUEMA_HISTORICO, preserve_index=False)
+
+        temporal = f"{compactado}.{os.getpid()}.tmp"
+        pq.write_table(tabla, temporal)
+        os.replace(temporal, compactado)
+        for parte in partes:
+            os.remove(parte)
+        return True
+    finally:
+        try:
+            os.remove(reclamo)
+        except OSError:
+            pass
+
+
+def compactar_historico() -> int:
+    """Compacta todas las particiones que tengan archivos parciales pendientes."""
+    if not os.path.isdir(RUTA_HISTORICO):
+        return 0
+
+    compactadas = 0
+    for entrada in os.scandir(RUTA_HISTORICO):
+        if entrada.is_dir() and entrada.name.startswith('fecha='):
+            try:
+                compactadas += compactar_particion(entrada.path)
+            except (OSError, pa.ArrowException) as e:
+                print(f"Error compactando {entrada.name}: {e}")
+    return compactadas
+
+
+def _bucle_compactacion():
+    while True:
+        time.sleep(INTERVALO_COMPACTACION)
+        compactar_historico()
+
+
+def iniciar_compactacion_historico() -> None:
+    """Arranca (una sola vez) el hilo de compactación en segundo plano."""
+    with _compactacion_lock:
+        if _compactacion['hilo'] is None:
+            hilo = threading.Thread(target=_bucle_compactacion, name="compactacion-historico", daemon=True)
+            hilo.start()
+            _compactacion['hilo'] = hilo
+
+
+# ============================================================================
+# CONTADORES HORARIOS POR BARCO
+# ============================================================================
+
+_NS_POR_HORA = 3_600_000_000_000
+
+# Matriz (barco, hora) en anillo: la columna de la hora absoluta h es h % HORAS_CONTADOR
+_contadores: Dict = {'barcos': None}
+_contadores_lock = threading.Lock()
+
+
+def _acumular_horas(matriz: np.ndarray, indice: Dict[str, int], barcos, fechas_ns: np.ndarray, hora_actual: int) -> None:
+    """Suma las alertas a la matriz con un solo np.bincount sobre códigos (barco, hora)."""
+    if len(fechas_ns) == 0:
+        return
+
+    codigos_barco = pd.Index(list(indice)).get_indexer(pd.Series(barcos).astype(object)).astype(np.int64)
+    horas = fechas_ns // _NS_POR_HORA
+    validas = (codigos_barco >= 0) & (horas > hora_actual - HORAS_CONTADOR) & (horas <= hora_actual)
+    codigos = codigos_barco[validas] * HORAS_CONTADOR + horas[validas] % HORAS_CONTADOR
+    matriz += np.bincount(codigos, minlength=matriz.size).reshape(matriz.shape).astype(matriz.dtype)
+
+
+def _avanzar_contadores(hora_actual: int) -> None:
+    """Limpia las columnas de las horas que el anillo recicla al avanzar el reloj."""
+    ultima = _contadores['hora']
+    if hora_actual <= ultima:
+        return
+    for hora in range(max(ultima + 1, hora_actual - HORAS_CONTADOR + 1), hora_actual + 1):
+        _contadores['matriz'][:, hora % HORAS_CONTADOR] = 0
+    _contadores['hora'] = hora_actual
+
+
+# Detector EWMA: un vector por clave ('barco' o 'barco|equipo'); la hora en curso
+# se acumula en 'actual' y al cerrarse actualiza media y varianza exponenciales.
+_detector: Dict = {'claves': {}, 'nombres': [], 'media': np.zeros(0), 'varianza': np.zeros(0),
+                   'actual': np.zeros(0), 'hora': None, 'horas_cerradas': 0, 'marcadas': set()}
+
+
+def _claves_detector(df: pd.DataFrame, barcos: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Índices de clave de barco y de (barco, equipo) por fila, creando las claves nuevas."""
+    df = df[df['Barco_Normalizado'].isin(barcos)]
+    barco = df['Barco_Normalizado'].astype(str)
+    equipo = columna_categorica(df['Activo'], 'SIN ACTIVO').astype(str) if 'Activo' in df.columns else 'SIN ACTIVO'
+    claves = pd.concat([barco, barco + '|' + equipo], ignore_index=True)
+
+    nuevas = pd.unique(claves[~claves.isin(_detector['claves'])])
+    if len(nuevas):
+        for clave in nuevas:
+            _detector['claves'][clave] = len(_detector['nombres'])
+            _detector['nombres'].append(clave)
+        extra = np.zeros(len(nuevas))
+        for campo in ('media', 'varianza', 'actual'):
+            _detector[campo] = np.concatenate([_detector[campo], extra])
+
+    indices = claves.map(_detector['claves']).to_numpy(np.int64)
+    horas = np.tile(df['Fecha'].astype('int64').to_numpy() // _NS_POR_HORA, 2)
+    return indices, horas, np.ones(len(indices))
+
+
+def _cerrar_hora_detector() -> None:
+    """Incorpora la hora en curso a la media/varianza EWMA de todas las claves (vectorizado)."""
+    delta = _detector['actual'] - _detector['media']
+    _detector['media'] += ALFA_EWMA * delta
+    _detector['varianza'] = (1 - ALFA_EWMA) * (_detector['varianza'] + ALFA_EWMA * delta ** 2)
+    _detector['actual'][:] = 0
+    _detector['horas_cerradas'] += 1
+
+
+def _avanzar_detector(hora_actual: int) -> None:
+    """Cierra las horas transcurridas desde la última actualización (como máximo una semana)."""
+    if _detector['hora'] is None:
+        _detector['hora'] = hora_actual
+        return
+    pendientes = min(hora_actual - _detector['hora'], HORAS_CONTADOR)
+    for _ in range(max(0, pendientes)):
+        _cerrar_hora_detector()
+    _detector['hora'] = max(_detector['hora'], hora_actual)
+
+
+def _reiniciar_detector(df_base: pd.DataFrame, barcos: List[str], hora_actual: int) -> None:
+    """Calienta el detector reproduciendo hora a hora la última semana del almacén."""
+    _detector.update({'claves': {}, 'nombres': [], 'media': np.zeros(0), 'varianza': np.zeros(0),
+                      'actual': np.zeros(0), 'hora': None, 'horas_cerradas': 0, 'marcadas': set()})
+    if df_base is None or df_base.empty:
+        return
+
+    indices, horas, _ = _claves_detector(df_base, barcos)
+    inicio = hora_actual - HORAS_CONTADOR + 1
+    validas = (horas >= inicio) & (horas <= hora_actual)
+    if not validas.any():
+        return
+
+    primera = int(horas[validas].min())
+    n_horas = hora_actual - primera + 1
+    n_claves = len(_detector['nombres'])
+    codigos = indices[validas] * n_horas + (horas[validas] - primera)
+    por_hora = np.bincount(codigos, minlength=n_claves * n_horas).reshape(n_claves, n_horas)
+
+    for columna in range(n_horas - 1):
+        _detector['actual'] = por_hora[:, columna].astype(float)
+        _cerrar_hora_detector()
+    _detector['actual'] = por_hora[:, -1].astype(float)
+    _detector['hora'] = hora_actual
+
+
+def _sumar_alertas_detector(df_nuevas: pd.DataFrame, barcos: List[str], hora_actual: int) -> None:
+    """Suma las alertas nuevas de la hora en curso: O(1) por alerta."""
+    if df_nuevas is None or df_nuevas.empty:
+        return
+    indices, horas, unos = _claves_detector(df_nuevas, barcos)
+    en_curso = horas == hora_actual
+    np.add.at(_detector['actual'], indices[en_curso], unos[en_curso])
+
+
+def _anomalias_detector() -> Dict[str, Dict]:
+    """
+    Barcos cuya tasa de la hora en curso se aleja de su EWMA en más de
+    UMBRAL_Z_ANOMALIA desviaciones (por barco o por alguno de sus equipos).
+    Cada clave se reporta una sola vez por hora.
+    """
+    if _detector['horas_cerradas'] < MIN_HORAS_DETECTOR or not _detector['nombres']:
+        return {}
+
+    actual = _detector['actual']
+    z = (actual - _detector['media']) / np.sqrt(_detector['varianza'] + VARIANZA_MINIMA)
+    candidatas = np.flatnonzero((actual >= MIN_ALERTAS_ANOMALIA) & (z >= UMBRAL_Z_ANOMALIA))
+
+    hora = _detector['hora']
+    _detector['marcadas'] = {(c, h) for c, h in _detector['marcadas'] if h == hora}
+    anomalias: Dict[str, Dict] = {}
+    for indice in candidatas[np.argsort(-z[candidatas])]:
+        if (indice, hora) in _detector['marcadas']:
+            continue
+        _detector['marcadas'].add((indice, hora))
+        barco, _, equipo = _detector['nombres'][indice].partition('|')
+        info = anomalias.setdefault(barco, {
+            'z': round(float(z[indice]), 1),
+            'tasa': int(actual[indice]),
+            'esperado': round(float(_detector['media'][indice]), 1),
+            'equipo': None
+        })
+        if equipo and info['equipo'] is None:
+            info['equipo'] = equipo
+    return anomalias
+
+
+def actualizar_contadores_horarios(df_flota: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    Mantiene los conteos por (barco, hora) de la última semana y el detector
+    EWMA de tasa horaria. La primera vez (o si cambia la flota) se construyen
+    desde el almacén local; luego solo se suman las filas nuevas de cada
+    actualización (por hash de fila). Retorna las anomalías recién detectadas.
+    """
+    barcos = obtener_barcos_flota()
+    hora_actual = ahora_ns() // _NS_POR_HORA
+
+    with _contadores_lock:
+        if _contadores['barcos'] != barcos:
+            indice = {barco: i for i, barco in enumerate(barcos)}
+            matriz = np.zeros((len(barcos), HORAS_CONTADOR), dtype=np.int32)
+            try:
+                df_base = leer_ventana_store(ahora_local() - timedelta(hours=HORAS_CONTADOR))
+            except sqlite3.Error as e:
+                print(f"Contadores horarios sin almacén local: {e}")
+                df_base = pd.DataFrame()
+            if df_base.empty:
+                df_base = df_flota
+
+            _, marca = detectar_filas_nuevas(df_base, None)
+            if not df_base.empty:
+                _acumular_horas(matriz, indice, df_base['Barco_Normalizado'],
+                                df_base['Fecha'].astype('int64').to_numpy(), hora_actual)
+            _contadores.update({'barcos': barcos, 'indice': indice, 'matriz': matriz,
+                                'hora': hora_actual, 'marca': marca})
+            _reiniciar_detector(df_base, barcos, hora_actual)
+
+        _avanzar_contadores(hora_actual)
+        _avanzar_detector(hora_actual)
+        df_nuevas, _contadores['marca'] = detectar_filas_nuevas(df_flota, _contadores['marca'])
+        if not df_nuevas.empty:
+            _acumular_horas(_contadores['matriz'], _contadores['indice'], df_nuevas['Barco_Normalizado'],
+                            df_nuevas['Fecha'].astype('int64').to_numpy(), hora_actual)
+            _sumar_alertas_detector(df_nuevas, barcos, hora_actual)
+
+        return _anomalias_detector()
+
+
+def serie_horaria_barcos(horas: int = 24) -> Tuple[List[str], np.ndarray, int]:
+    """
+    Conteos de las últimas `horas` horas por barco, en orden cronológico.
+    Retorna (barcos, matriz barcos x horas, hora absoluta de la última columna).
+    """
+    with _contadores_lock:
+        if _contadores['barcos'] is None:
+            return [], np.zeros((0, horas), dtype=np.int32), ahora_ns() // _NS_POR_HORA
+        _avanzar_contadores(ahora_ns() // _NS_POR_HORA)
+        hora_actual = _contadores['hora']
+        columnas = np.arange(hora_actual - horas + 1, hora_actual + 1) % HORAS_CONTADOR
+        return list(_contadores['barcos']), _contadores['matriz'][:, columnas].copy(), hora_actual
+
+
+def perfil_hora_del_dia() -> Tuple[List[str], np.ndarray]:
+    """Conteos de la última semana por barco y hora del día local (0-23)."""
+    barcos, serie, hora_actual = serie_horaria_barcos(HORAS_CONTADOR)
+    desfase = int(ahora_local().utcoffset().total_seconds() // 3600)
+    horas_locales = (np.arange(hora_actual - HORAS_CONTADOR + 1, hora_actual + 1) + desfase) % 24
+    perfil = np.zeros((len(barcos), 24), dtype=np.int64)
+    np.add.at(perfil.T, horas_locales, serie.T)
+    return barcos, perfil
+
+
+def crear_heatmap_horas(barcos_ordenados: List[str], ventana: str = '24h') -> go.Figure:
+    """Heatmap barco x hora con el mismo orden de barcos que los velocímetros."""
+    if ventana == '7d':
+        barcos, matriz = perfil_hora_del_dia()
+        etiquetas = [f"{hora:02d}:00" for hora in range(24)]
+    else:
+        barcos, matriz, hora_actual = serie_horaria_barcos(24)
+        inicio = pd.Timestamp((hora_actual - 23) * _NS_POR_HORA, tz='UTC').tz_convert(ZONA_HORARIA)
+        etiquetas = [(inicio + timedelta(hours=h)).strftime('%H:00') for h in range(24)]
+
+    indice = {barco: i for i, barco in enumerate(barcos)}
+    filas = [indice[barco] for barco in barcos_ordenados if barco in indice]
+    z = matriz[filas] if filas else np.zeros((0, 24))
+
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=etiquetas,
+        y=[barcos[i] for i in filas],
+        colorscale=[[0, '#1a1a2e'], [0.3, '#2ecc71'], [0.6, '#f39c12'], [1, '#e74c3c']],
+        hovertemplate="%{y}<br>%{x}: %{z} alertas<extra></extra>",
+        colorbar={'tickfont': {'color': '#ecf0f1'}}
+    ))
+    fig.update_layout(
+        height=max(300, 26 * len(filas) + 80),
+        margin=dict(l=10, r=10, t=10, b=40),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#ecf0f1'},
+        yaxis={'autorange': 'reversed', 'type': 'category'},
+        xaxis={'type': 'category'}
+    )
+    return fig
+
+
+# ============================================================================
+# MATRIZ EQUIPO x BARCO (TODA LA FLOTA)
+# ============================================================================
+
+def construir_matriz_equipos(df_flota: pd.DataFrame) -> Dict:
+    """
+    Agregado disperso (formato COO) de alertas por (equipo, barco, tipo de alerta)
+    para la ventana del snapshot: solo se guardan las combinaciones con alertas.
+    """
+    barcos = obtener_barcos_flota()
+    vacia = {'equipos': [], 'barcos': barcos, 'alertas': [],
+             'equipo': np.zeros(0, dtype=np.int64), 'barco': np.zeros(0, dtype=np.int64),
+             'alerta': np.zeros(0, dtype=np.int64), 'cantidad': np.zeros(0, dtype=np.int64)}
+    if df_flota is None or df_flota.empty:
+        return vacia
+
+    df = df_flota[df_flota['Barco_Normalizado'].isin(barcos)]
+    if df.empty:
+        return vacia
+
+    equipos = columna_categorica(df['Activo'], 'SIN ACTIVO')
+    alertas = columna_categorica(df['Alerta'], 'SIN ALERTA')
+    codigo_barco = pd.Categorical(df['Barco_Normalizado'].astype(str), categories=barcos).codes.astype(np.int64)
+    nb, na = len(barcos), len(alertas.cat.categories)
+
+    codigos = (equipos.cat.codes.to_numpy(np.int64) * nb + codigo_barco) * na + alertas.cat.codes.to_numpy(np.int64)
+    unicos, cantidades = np.unique(codigos, return_counts=True)
+    return {
+        'equipos': [str(e) for e in equipos.cat.categories],
+        'barcos': barcos,
+        'alertas': [str(a) for a in alertas.cat.categories],
+        'equipo': unicos // (nb * na),
+        'barco': (unicos // na) % nb,
+        'alerta': unicos % na,
+        'cantidad': cantidades
+    }
+
+
+def densificar_matriz_equipos(matriz: Dict, alerta: Optional[str] = None) -> np.ndarray:
+    """Matriz densa equipo x barco sumando sobre el agregado (opcionalmente de un tipo de alerta)."""
+    ne, nb = len(matriz['equipos']), len(matriz['barcos'])
+    seleccion = slice(None)
+    if alerta is not None:
+        if alerta not in matriz['alertas']:
+            return np.zeros((ne, nb), dtype=np.int64)
+        seleccion = matriz['alerta'] == matriz['alertas'].index(alerta)
+
+    celdas = matriz['equipo'][seleccion] * nb + matriz['barco'][seleccion]
+    return np.bincount(celdas, weights=matriz['cantidad'][seleccion], minlength=ne * nb).astype(np.int64).reshape(ne, nb)
+
+
+def crear_figura_matriz_equipos(matriz: Dict, barcos_ordenados: List[str], alerta: Optional[str] = None,
+                                orden: str = 'total') -> go.Figure:
+    """Heatmap equipo x barco (equipos más afectados arriba, barcos en el orden de los velocímetros)."""
+    densa = densificar_matriz_equipos(matriz, alerta)
+    columnas = [matriz['barcos'].index(b) for b in barcos_ordenados if b in matriz['barcos']]
+    densa = densa[:, columnas] if columnas else densa[:, :0]
+
+    totales = densa.sum(axis=1)
+    filas = np.flatnonzero(totales)
+    if orden == 'nombre':
+        filas = filas[np.argsort(np.array(matriz['equipos'], dtype=object)[filas], kind='stable')]
+    else:
+        clave = (densa[filas] > 0).sum(axis=1) if orden == 'barcos' else totales[filas]
+        filas = filas[np.argsort(-clave, kind='stable')]
+    filas = filas[:MAX_EQUIPOS_MATRIZ]
+
+    fig = go.Figure(go.Heatmap(
+        z=densa[filas],
+        x=[matriz['barcos'][c] for c in columnas],
+        y=[f"{matriz['equipos'][f]} ({totales[f]})" for f in filas],
+        colorscale=[[0, '#1a1a2e'], [0.3, '#2ecc71'], [0.6, '#f39c12'], [1, '#e74c3c']],
+        hovertemplate="%{y}<br>%{x}: %{z} alertas<extra></extra>",
+        colorbar={'tickfont': {'color': '#ecf0f1'}}
+    ))
+    fig.update_layout(
+        height=max(300, 24 * len(filas) + 120),
+        margin=dict(l=10, r=10, t=10, b=90),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#ecf0f1'},
+        yaxis={'autorange': 'reversed', 'type': 'category'},
+        xaxis={'type': 'category', 'tickangle': -45}
+    )
+    if len(filas) == 0:
+        fig.add_annotation(text="Sin alertas para el filtro seleccionado", xref="paper", yref="paper",
+                           x=0.5, y=0.5, showarrow=False, font=dict(size=16, color="#95a5a6"))
+    return fig
+
+
+# ============================================================================
+# SNAPSHOT PROCESADO EN MEMORIA
+# ============================================================================
+
+_snapshot: Dict = {'version': None}
+_snapshot_lock = threading.Lock()
+_snapshot_refresco_lock = threading.Lock()
+
+
+def cargar_df_flota() -> Tuple[Optional[pd.DataFrame], pd.DataFrame, List[str]]:
+    """
+    Carga el sheet y prepara la ventana 24h de la flota, sincronizando el
+    almacén local. Sin acceso al sheet usa la ventana 24h del almacén.
+    Retorna (df_raw o None si se usó el almacén, df_flota, debug_info).
+    """
+    df_raw, error = cargar_datos()
+
+    if error or df_raw.empty:
+        debug_info = [f"❌ Error: {error if error else 'Sin datos'}"]
+        try:
+            df_flota = leer_ventana_store(ahora_local() - timedelta(hours=24))
+        except sqlite3.Error as e:
+            debug_info.append(f"❌ Almacén local no disponible: {e}")
+            df_flota = pd.DataFrame()
+
+        if not df_flota.empty:
+            debug_info.append(f"💾 Usando almacén local: {len(df_flota)} registros (24h)")
+        return None, df_flota, debug_info
+
+    df_flota, debug_info = preparar_df_flota_24h(df_raw)
+    df_guardadas = sincronizar_store(df_raw, df_flota)
+    debug_info.append(f"💾 Almacén local: {len(df_guardadas)} alertas nuevas")
+    return df_raw, df_flota, debug_info
+
+
+def publicar_snapshot(df_flota: pd.DataFrame, debug_info: List[str], almacen: bool = False) -> Dict:
+    """
+    Cuenta, versiona y precalcula los detalles de la ventana 24h, registra
+    el evento de alertas nuevas y publica el resultado como snapshot del
+    proceso (lo usan los callbacks y la API JSON). Con `almacen` (sin acceso
+    al sheet) los conteos salen de una consulta indexada del almacén.
+    """
+    conteo_alertas = None
+    if almacen:
+        try:
+            conteo_alertas, alertas_sin_barco, _ = contar_alertas_store(ahora_local() - timedelta(hours=24), debug_info)
+        except sqlite3.Error as e:
+            debug_info.append(f"❌ Conteo en almacén local no disponible: {e}")
+    if conteo_alertas is None:
+        conteo_alertas, alertas_sin_barco, _ = contar_alertas_por_barco(df_flota, debug_info)
+
+    # Precalcular en segundo plano el detalle de cada barco para esta versión
+    version = calcular_version_datos(df_flota)
+    precalcular_detalles_flota(version, df_flota)
+    debug_info.append(f"🔖 Versión de datos: {version}")
+
+    iniciar_watchdog_memoria()
+    iniciar_programador_turnos()
+    anomalias = actualizar_contadores_horarios(df_flota)
+    evento = registrar_evento_version(version, df_flota, anomalias)
+    if evento['nuevas']:
+        debug_info.append(f"🆕 Alertas nuevas en esta versión: {sum(i['cantidad'] for i in evento['nuevas'].values())}")
+    for barco, info in anomalias.items():
+        debug_info.append(f"📈 Tasa inusual en {barco}: {info['tasa']}/h (esperado {info['esperado']}, z={info['z']})")
+
+    with _snapshot_lock:
+        if _snapshot.get('version') != version:
+            _snapshot.clear()
+            _snapshot.update({
+                'version': version,
+                'df_flota': df_flota,
+                'conteo_alertas': conteo_alertas,
+                'alertas_sin_barco': alertas_sin_barco,
+                'matriz_equipos': construir_matriz_equipos(df_flota),
+                'creado': time.monotonic(),
+                'actualizado': ahora_local().isoformat()
+            })
+            cache_guardar(('ventana', version), df_flota, disco=True)
+            cache_guardar(('matriz', version), _snapshot['matriz_equipos'])
+        else:
+            _snapshot['creado'] = time.monotonic()
+        return dict(_snapshot)
+
+
+def obtener_snapshot() -> Dict:
+    """Snapshot actual; lo recalcula si no existe o tiene más de EDAD_MAXIMA_SNAPSHOT segundos."""
+    with _snapshot_lock:
+        vigente = _snapshot.get('version') and time.monotonic() - _snapshot['creado'] < EDAD_MAXIMA_SNAPSHOT
+        if vigente:
+            return dict(_snapshot)
+
+    with _snapshot_refresco_lock:
+        with _snapshot_lock:
+            if _snapshot.get('version') and time.monotonic() - _snapshot['creado'] < EDAD_MAXIMA_SNAPSHOT:
+                return dict(_snapshot)
+        df_raw, df_flota, debug_info = cargar_df_flota()
+        if df_flota.empty:
+            print("\n".join(debug_info))
+            with _snapshot_lock:
+                return dict(_snapshot)
+        return publicar_snapshot(df_flota, debug_info, almacen=df_raw is None)
+
+
+def obtener_matriz_version(version: Optional[str]) -> Dict:
+    """
+    Matriz equipo x barco de una versión: de la cache, reconstruida desde su
+    ventana (memoria o nivel Arrow) o, si ya no existe, la del snapshot vigente.
+    Nunca dispara una recarga de datos.
+    """
+    matriz = cache_obtener(('matriz', version)) if version else None
+    if matriz is None and version:
+        df_flota = cache_obtener(('ventana', version), disco=True)
+        if df_flota is not None:
+            matriz = cache_guardar(('matriz', version), construir_matriz_equipos(df_flota))
+    if matriz is None:
+        with _snapshot_lock:
+            matriz = _snapshot.get('matriz_equipos')
+    return matriz or construir_matriz_equipos(None)
+
+
+# ============================================================================
+# VIGILANCIA DE MEMORIA
+# ============================================================================
+
+_watchdog: Dict = {'hilo': None, 'reporte': {}}
+_watchdog_lock = threading.Lock()
+_revision_memoria_lock = threading.Lock()  # se toma antes de un fork para no heredar locks a medio usar
+
+
+def memoria_rss_mb() -> float:
+    """RSS actual del proceso en MB (/proc en Linux; pico de getrusage como respaldo)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_estructuras() -> Dict[str, Dict]:
+    """Tamaño (MB) y cantidad de elementos de las estructuras en memoria del proceso."""
+    with _estado_fuentes_lock:
+        fuentes = [e['df'] for e in _estado_fuentes.values() if e.get('df') is not None]
+    with _historial_pendiente_lock:
+        pendientes = list(_historial_pendiente.values())
+    with _snapshot_lock:
+        df_flota = _snapshot.get('df_flota')
+    with _contadores_lock:
+        contadores = [_contadores.get('matriz'), _detector['media'], _detector['varianza'], _detector['actual']]
+
+    def entrada(elementos: int, tamano: int) -> Dict:
+        return {'elementos': elementos, 'mb': round(tamano / 1024 ** 2, 3)}
+
+    return {
+        'fuentes_crudas': entrada(sum(len(df) for df in fuentes), sum(_tamano_aproximado(df) for df in fuentes)),
+        'historial_por_archivar': entrada(sum(len(df) for df in pendientes), sum(_tamano_aproximado(df) for df in pendientes)),
+        'ventana_snapshot': entrada(0 if df_flota is None else len(df_flota), _tamano_aproximado(df_flota)),
+        **resumen_cache(),
+        'eventos': entrada(len(_eventos_cache), _tamano_aproximado(list(_eventos_cache.values()))),
+        'contadores_horarios': entrada(len(_detector['nombres']), sum(_tamano_aproximado(a) for a in contadores if a is not None)),
+        'sugerencias_barco': entrada(len(obtener_registro_flotas()['sugerencias']), _tamano_aproximado(obtener_registro_flotas()['sugerencias']))
+    }
+
+
+def liberar_caches() -> List[str]:
+    """Vacía los caches reconstruibles; se conservan las entradas de la versión vigente."""
+    with _snapshot_lock:
+        version = _snapshot.get('version')
+    expulsadas = cache_limpiar(conservar=version)
+    with _eventos_lock:
+        while len(_eventos_cache) > 5:
+            _eventos_cache.popitem(last=False)
+    obtener_registro_flotas()['sugerencias'].clear()
+    gc.collect()
+    return [f"cache ({expulsadas} entradas)", 'eventos', 'sugerencias_barco']
+
+
+def revisar_memoria() -> Dict:
+    """Mide RSS y estructuras; si el RSS supera LIMITE_MEMORIA_MB libera caches y vuelve a medir."""
+    reporte = {'rss_mb': round(memoria_rss_mb(), 1), 'limite_mb': LIMITE_MEMORIA_MB,
+               'estructuras': medir_estructuras(), 'liberado': [], 'medido': ahora_local().isoformat()}
+    if reporte['rss_mb'] > LIMITE_MEMORIA_MB:
+        reporte['liberado'] = liberar_caches()
+        reporte['rss_mb_tras_liberar'] = round(memoria_rss_mb(), 1)
+        print(f"Memoria {reporte['rss_mb']} MB > {LIMITE_MEMORIA_MB} MB: liberados {reporte['liberado']}")
+
+    with _watchdog_lock:
+        _watchdog['reporte'] = reporte
+    return reporte
+
+
+def _bucle_watchdog():
+    while True:
+        time.sleep(INTERVALO_WATCHDOG)
+        try:
+            with _revision_memoria_lock:
+                revisar_memoria()
+        except Exception as e:
+            print(f"Error en vigilancia de memoria: {e}")
+
+
+def iniciar_watchdog_memoria() -> None:
+    """Arranca (una sola vez) el hilo de vigilancia de memoria."""
+    with _watchdog_lock:
+        if _watchdog['hilo'] is None:
+            hilo = threading.Thread(target=_bucle_watchdog, name="watchdog-memoria", daemon=True)
+            hilo.start()
+            _watchdog['hilo'] = hilo
 
-        df_barco = df_flota[df_flota['Barco_Normalizado'] == barco].copy()
-        if df_barco.empty:
-            return None
 
-        if 'Activo' not in df_barco.columns:
+# ============================================================================
+# EXPORTACIÓN DE ALERTAS
+# ============================================================================
+
+_COLUMNAS_EXPORTACION = ['Fecha', 'Barco', 'Flota', 'Area', 'Activo', 'Alerta']
+
+_ESQUEMA_EXPORTACION = pa.schema([
+    ('Fecha', pa.timestamp('ns', tz=str(ZONA_HORARIA))),
+    ('Barco', pa.dictionary(pa.int32(), pa.string())),
+    ('Flota', pa.dictionary(pa.int32(), pa.string())),
+    ('Area', pa.dictionary(pa.int32(), pa.string())),
+    ('Activo', pa.dictionary(pa.int32(), pa.string())),
+    ('Alerta', pa.dictionary(pa.int32(), pa.string())),
+])
+
+
+def _fechas_locales(bloque: List[Tuple]) -> pd.DatetimeIndex:
+    fechas_ns = np.fromiter((fila[0] for fila in bloque), dtype=np.int64, count=len(bloque))
+    return pd.to_datetime(fechas_ns, utc=True).tz_convert(ZONA_HORARIA)
+
+
+def exportar_csv(bloques):
+    """Genera el CSV bloque a bloque (cada bloque se codifica y se envía al cliente)."""
+    buffer = StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(_COLUMNAS_EXPORTACION)
+    yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')  # BOM para Excel
+
+    try:
+        for bloque in bloques:
+            buffer.seek(0)
+            buffer.truncate()
+            fechas = _fechas_locales(bloque).strftime('%Y-%m-%d %H:%M:%S')
+            escritor.writerows((fecha,) + tuple(fila[1:]) for fecha, fila in zip(fechas, bloque))
+            yield buffer.getvalue().encode('utf-8')
+    except sqlite3.Error as e:
+        # La respuesta 200 ya salió; se registra y se corta el envío (el cliente ve una descarga incompleta)
+        print(f"Error exportando alertas (csv) a mitad del envío: {e}")
+
+
+def _enviar_archivo(archivo):
+    """Envía un archivo temporal ya escrito en bloques de BYTES_BLOQUE_ARCHIVO y lo cierra."""
+    try:
+        archivo.seek(0)
+        while True:
+            datos = archivo.read(BYTES_BLOQUE_ARCHIVO)
+            if not datos:
+                break
+            yield datos
+    finally:
+        archivo.close()
+
+
+def exportar_parquet(bloques):
+    """Escribe un row group por bloque en un archivo temporal y lo envía."""
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 ** 2)
+    with pq.ParquetWriter(archivo, _ESQUEMA_EXPORTACION, compression='zstd') as escritor:
+        for bloque in bloques:
+            columnas = list(zip(*bloque))
+            escritor.write_table(pa.table({
+                'Fecha': pa.array(_fechas_locales(bloque), type=_ESQUEMA_EXPORTACION.field('Fecha').type),
+                **{
+                    nombre: pa.array(valores, type=pa.string()).dictionary_encode()
+                    for nombre, valores in zip(_COLUMNAS_EXPORTACION[1:], columnas[1:])
+                }
+            }, schema=_ESQUEMA_EXPORTACION))
+    return _enviar_archivo(archivo)
+
+
+def exportar_xlsx(bloques):
+    """Libro Excel en modo write_only (filas en streaming) guardado en un archivo temporal."""
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Alertas')
+    hoja.append(_COLUMNAS_EXPORTACION)
+
+    filas_escritas = 0
+    for bloque in bloques:
+        restantes = MAX_FILAS_EXCEL - filas_escritas
+        bloque = bloque[:restantes]
+        fechas = _fechas_locales(bloque).tz_localize(None).to_pydatetime()
+        for fecha, fila in zip(fechas, bloque):
+            hoja.append((fecha,) + tuple(fila[1:]))
+        filas_escritas += len(bloque)
+        if filas_escritas >= MAX_FILAS_EXCEL:
+            print(f"Exportación Excel truncada a {MAX_FILAS_EXCEL} filas")
+            break
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 ** 2)
+    libro.save(archivo)
+    return _enviar_archivo(archivo)
+
+
+_EXPORTADORES = {'csv': exportar_csv, 'parquet': exportar_parquet, 'xlsx': exportar_xlsx}
+
+
+def url_exportacion(formato: str, ventana: str, barco: Optional[str] = None) -> str:
+    parametros = {'formato': formato, 'ventana': ventana}
+    if barco:
+        parametros['barco'] = barco
+    return f"/api/export?{urlencode(parametros)}"
+
+
+@server.route('/api/export')
+def api_exportar():
+    """
+    Descarga las alertas de un barco o de toda la flota para una ventana.
+    Lee del almacén indexado por bloques; el CSV se envía mientras se genera.
+    Corre en el hilo de la petición, fuera de los callbacks del dashboard.
+    """
+    formato = request.args.get('formato', 'csv')
+    ventana = request.args.get('ventana', '24h')
+    nombre = request.args.get('barco')
+
+    if formato not in FORMATOS_EXPORTACION or ventana not in VENTANAS_EXPORTACION:
+        return Response(json.dumps({'error': 'Formato o ventana inválidos'}), status=400, mimetype='application/json')
+
+    barco = None
+    if nombre:
+        barco = normalizar_nombre_barco(nombre)
+        if barco not in obtener_barcos_flota():
+            return Response(json.dumps({'error': f"Barco desconocido: {nombre}"}), status=404, mimetype='application/json')
+
+    ahora = ahora_local()
+    mimetype, extension = FORMATOS_EXPORTACION[formato]
+    sufijo = (barco or 'flota').replace(' ', '_')
+    nombre_archivo = f"alertas_{sufijo}_{ventana}_{ahora.strftime('%Y%m%d_%H%M')}.{extension}"
+
+    try:
+        # El primer bloque se lee aquí: la consulta se valida antes de responder 200
+        bloques = iterar_alertas_store(ahora - VENTANAS_EXPORTACION[ventana], barco)
+        primero = next(bloques, None)
+        bloques = chain([primero], bloques) if primero is not None else iter(())
+        cuerpo = _EXPORTADORES[formato](bloques)
+    except (sqlite3.Error, pa.ArrowException, OSError) as e:
+        print(f"Error exportando alertas ({formato}): {e}")
+        return Response(json.dumps({'error': 'No se pudo generar la exportación'}), status=500, mimetype='application/json')
+
+    respuesta = Response(stream_with_context(cuerpo), mimetype=mimetype)
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+# ============================================================================
+# REPORTES DE CAMBIO DE TURNO
+# ============================================================================
+
+_reportes_lock = threading.Lock()
+_programador_turnos: Dict = {'hilo': None, 'ultimo': None}  # ultimo = (fin del turno, ¿ya pasó la tolerancia?)
+
+
+def limites_turno(momento: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """(inicio, fin) del último turno cerrado en `momento` según HORAS_CAMBIO_TURNO (hora local)."""
+    local = (momento or ahora_local()).astimezone(ZONA_HORARIA)
+    cambios = sorted(
+        ZONA_HORARIA.localize(datetime.combine(local.date() + timedelta(days=dias), datetime.min.time()).replace(hour=hora))
+        for dias in (-1, 0) for hora in HORAS_CAMBIO_TURNO
+    )
+    cerrados = [c for c in cambios if c <= local]
+    return cerrados[-2], cerrados[-1]
+
+
+def _inicio_lectura_turno(inicio: datetime, fin: datetime) -> datetime:
+    """Desde dónde lee el reporte: el turno anterior y la ventana de alertas nuevas."""
+    return inicio - max(VENTANA_NUEVAS_TURNO, fin - inicio)
+
+
+def marca_reporte_turno(inicio: datetime, fin: datetime) -> int:
+    """
+    Filas del almacén que lee el reporte del turno. Cambia si llegan filas
+    tarde (hasta TOLERANCIA_LLEGADA después del cierre) o si el almacén se
+    llena después (backfill, primer arranque), y con ello el reporte se rehace.
+    """
+    fila = conexion_store().execute(
+        "SELECT COUNT(*) FROM alertas WHERE fecha >= ? AND fecha < ?",
+        (_fecha_a_ns(_inicio_lectura_turno(inicio, fin)), _fecha_a_ns(fin))
+    ).fetchone()
+    return int(fila[0])
+
+
+def construir_reporte_turno(inicio: datetime, fin: datetime) -> Dict:
+    """
+    Reporte de un turno desde el almacén local: alertas por barco (y del
+    turno anterior), equipos con más alertas y combinaciones equipo/alerta
+    que no aparecieron en las VENTANA_NUEVAS_TURNO previas al turno.
+    """
+    duracion = fin - inicio
+    df = leer_ventana_store(_inicio_lectura_turno(inicio, fin), fin)
+    if df.empty:
+        df = pd.DataFrame({c: pd.Series(dtype='object') for c in ('Activo', 'Alerta', 'Barco_Normalizado')})
+        df['Fecha'] = pd.Series(dtype=f"datetime64[ns, {ZONA_HORARIA}]")
+
+    df = df[df['Barco_Normalizado'].notna()]
+    en_turno = (df['Fecha'] >= inicio).to_numpy()
+    df_turno, df_previo = df[en_turno], df[~en_turno]
+    conteo = df_turno.groupby('Barco_Normalizado', observed=True).size()
+    conteo_anterior = df_previo[df_previo['Fecha'] >= inicio - duracion].groupby('Barco_Normalizado', observed=True).size()
+
+    por_equipo = df_turno.groupby(['Barco_Normalizado', 'Activo'], observed=True).size().sort_values(ascending=False, kind='stable')
+    claves = ['Barco_Normalizado', 'Activo', 'Alerta']
+    combinaciones = df_turno.groupby(claves, observed=True)['Fecha'].agg(['min', 'size'])
+    vistas = pd.MultiIndex.from_frame(df_previo[claves].astype(object).drop_duplicates())
+    nuevas = combinaciones[~combinaciones.index.isin(vistas)].sort_values('min')
+
+    barcos = []
+    for barco in ordenar_barcos_por_alertas(obtener_barcos_flota(), conteo.to_dict()):
+        equipos_barco = por_equipo.loc[barco] if barco in por_equipo.index.get_level_values(0) else pd.Series(dtype=int)
+        nuevas_barco = nuevas.loc[barco] if barco in nuevas.index.get_level_values(0) else nuevas.iloc[0:0]
+        barcos.append({
+            'barco': barco,
+            'alertas': int(conteo.get(barco, 0)),
+            'turno_anterior': int(conteo_anterior.get(barco, 0)),
+            'top_equipos': [{'equipo': e, 'alertas': int(n)} for e, n in equipos_barco.head(TOP_EQUIPOS_REPORTE).items()],
+            'nuevas': [
+                {'equipo': e, 'alerta': a, 'primera': f.isoformat(), 'alertas': int(n)}
+                for (e, a), f, n in zip(nuevas_barco.index, nuevas_barco['min'], nuevas_barco['size'])
+            ]
+        })
+
+    return {
+        'turno': {'inicio': inicio.isoformat(), 'fin': fin.isoformat()},
+        'generado': ahora_local().isoformat(),
+        'total_alertas': int(conteo.sum()),
+        'total_turno_anterior': int(conteo_anterior.sum()),
+        'top_equipos': [
+            {'barco': b, 'equipo': e, 'alertas': int(n)}
+            for (b, e), n in por_equipo.head(TOP_EQUIPOS_REPORTE).items()
+        ],
+        'barcos': barcos
+    }
+
+
+def renderizar_reporte_html(reporte: Dict) -> str:
+    """Página HTML estática (sin JavaScript) del reporte de turno."""
+    e = html_escape
+    inicio = datetime.fromisoformat(reporte['turno']['inicio'])
+    fin = datetime.fromisoformat(reporte['turno']['fin'])
+
+    filas = []
+    for b in reporte['barcos']:
+        delta = b['alertas'] - b['turno_anterior']
+        equipos = ", ".join(f"{e(x['equipo'])} ({x['alertas']})" for x in b['top_equipos']) or "—"
+        nuevas = "<br>".join(
+            f"{e(x['equipo'])}: {e(x['alerta'])} ×{x['alertas']} desde {x['primera'][11:16]}" for x in b['nuevas']
+        ) or "—"
+        filas.append(
+            f"<tr><td>{e(b['barco'])}</td><td class='n'>{b['alertas']}</td>"
+            f"<td class='n'>{delta:+d}</td><td>{equipos}</td><td>{nuevas}</td></tr>"
+        )
+    top = "".join(
+        f"<li>{e(x['barco'])} · {e(x['equipo'])}: {x['alertas']}</li>" for x in reporte['top_equipos']
+    ) or "<li>Sin alertas en el turno</li>"
+
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Reporte de turno {inicio:%d/%m %H:%M}–{fin:%H:%M}</title>
+<style>
+body {{ background: #1a1a1a; color: #ecf0f1; font-family: sans-serif; margin: 20px; }}
+h1 {{ color: #2ecc71; font-size: 22px; }} h2 {{ color: #2ecc71; font-size: 16px; }}
+table {{ border-collapse: collapse; width: 100%; font-size: 13px; }}
+th, td {{ border-bottom: 1px solid #2c3e50; padding: 6px 8px; text-align: left; vertical-align: top; }}
+th {{ color: #bdc3c7; }} td.n {{ text-align: right; }}
+.pie {{ color: #7f8c8d; font-size: 12px; margin-top: 15px; }}
+</style></head><body>
+<h1>🚢 Reporte de turno {inicio:%d/%m/%Y %H:%M} – {fin:%d/%m/%Y %H:%M}</h1>
+<p>Total de alertas: <b>{reporte['total_alertas']}</b> (turno anterior: {reporte['total_turno_anterior']})</p>
+<h2>Equipos con más alertas</h2><ol>{top}</ol>
+<h2>Por barco</h2>
+<table><tr><th>Barco</th><th>Alertas</th><th>Δ turno anterior</th><th>Equipos principales</th><th>Alertas nuevas</th></tr>
+{''.join(filas)}
+</table>
+<p class="pie">Generado {e(reporte['generado'])}. Alertas nuevas: equipo/alerta sin registros en las {int(VENTANA_NUEVAS_TURNO.total_seconds() // 3600)} h previas al turno.</p>
+</body></html>"""
+
+
+def _ruta_reporte(fin: datetime, marca: int, formato: str) -> str:
+    return os.path.join(RUTA_REPORTES, f"turno-{fin:%Y%m%d-%H%M}-{marca}.{formato}")
+
+
+def _leer_reporte_disco(rutas: Dict[str, str]) -> Optional[Dict[str, bytes]]:
+    cuerpos = {}
+    for formato, ruta in rutas.items():
+        try:
+            with open(ruta, 'rb') as f:
+                cuerpos[formato] = f.read()
+        except OSError:
             return None
+    return cuerpos
 
-        df_barco['Activo'] = df_barco['Activo'].fillna('SIN ACTIVO').astype(str).str.strip()
-        df_barco = df_barco.sort_values('Fecha', ascending=False)
-        equipo = df_barco.iloc[0]['Activo']
-        
-        return equipo if equipo else None
-    
-    except Exception as e:
-        print(f"Error obteniendo equipo más reciente: {e}")
-        return None
+
+def obtener_reporte_turno(inicio: datetime, fin: datetime) -> Dict:
+    """
+    Reporte del turno [inicio, fin) ya serializado ({'json', 'html',
+    'etag'} en bytes): de la cache, de disco (otro worker o un reinicio) o
+    generándolo. Se indexa por la marca del almacén, así que un reporte
+    generado antes de que llegaran todas sus filas se rehace y reemplaza.
+    """
+    marca = marca_reporte_turno(inicio, fin)
+    clave = ('reporte', fin.isoformat(), marca)
+    entrada = cache_obtener(clave)
+    if entrada is not None:
+        return entrada
+
+    with _reportes_lock:
+        entrada = cache_obtener(clave)
+        if entrada is not None:
+            return entrada
+
+        rutas = {formato: _ruta_reporte(fin, marca, formato) for formato in ('json', 'html')}
+        cuerpos = _leer_reporte_disco(rutas)
+        if cuerpos is None:
+            reporte = construir_reporte_turno(inicio, fin)
+            cuerpos = {
+                'json': json.dumps(reporte, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                'html': renderizar_reporte_html(reporte).encode('utf-8')
+            }
+            try:
+                os.makedirs(RUTA_REPORTES, exist_ok=True)
+                for formato, ruta in rutas.items():
+                    temporal = f"{ruta}.{os.getpid()}.tmp"
+                    with open(temporal, 'wb') as f:
+                        f.write(cuerpos[formato])
+                    os.replace(temporal, ruta)
+                # Versiones anteriores del mismo turno (menos filas) ya no sirven
+                prefijo = f"turno-{fin:%Y%m%d-%H%M}-"
+                vigentes = {os.path.basename(ruta) for ruta in rutas.values()}
+                for nombre in os.listdir(RUTA_REPORTES):
+                    if nombre.startswith(prefijo) and nombre not in vigentes and not nombre.endswith('.tmp'):
+                        os.remove(os.path.join(RUTA_REPORTES, nombre))
+            except OSError as e:
+                print(f"Error guardando reporte de turno: {e}")
+
+        entrada = dict(cuerpos, etag=hashlib.blake2b(cuerpos['json'], digest_size=8).hexdigest())
+        return cache_guardar(clave, entrada)
+
+
+def _reclamar_turno(fin: datetime, definitivo: bool) -> bool:
+    """
+    Entre los workers, solo el primero que crea el archivo de reclamo genera
+    el reporte de esta fase del turno; los demás lo leen de disco al pedirlo.
+    """
+    nombre = f"turno-{fin:%Y%m%d-%H%M}-{'definitivo' if definitivo else 'cierre'}.reclamo"
+    try:
+        os.makedirs(RUTA_REPORTES, exist_ok=True)
+        os.close(os.open(os.path.join(RUTA_REPORTES, nombre), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    except OSError as e:
+        print(f"Error reclamando reporte de turno: {e}")
+        return True
+
+    # Reclamos de turnos anteriores ya no se necesitan
+    vigentes = (f"turno-{fin:%Y%m%d-%H%M}-cierre.reclamo", f"turno-{fin:%Y%m%d-%H%M}-definitivo.reclamo")
+    for otro in os.listdir(RUTA_REPORTES):
+        if otro.endswith('.reclamo') and otro not in vigentes:
+            try:
+                os.remove(os.path.join(RUTA_REPORTES, otro))
+            except OSError:
+                pass
+    return True
+
+
+def _bucle_programador_turnos():
+    while True:
+        try:
+            inicio, fin = limites_turno()
+            # Dos pasadas por turno: al cierre y, ya pasada la tolerancia, con las filas que llegaron tarde
+            definitivo = ahora_local() >= fin + TOLERANCIA_LLEGADA
+            if _programador_turnos['ultimo'] != (fin, definitivo):
+                if _reclamar_turno(fin, definitivo):
+                    # Refrescar el snapshot sincroniza el almacén y deja listos los detalles por barco
+                    obtener_snapshot()
+                    obtener_reporte_turno(inicio, fin)
+                    print(f"Reporte de turno {'definitivo' if definitivo else 'al cierre'} listo: {fin:%d/%m/%Y %H:%M}")
+                _programador_turnos['ultimo'] = (fin, definitivo)
+        except Exception as e:
+            print(f"Error en reporte de turno: {e}")
+        time.sleep(INTERVALO_PROGRAMADOR_TURNOS)
+
+
+def iniciar_programador_turnos() -> None:
+    """Arranca (una sola vez) el hilo que prepara el reporte de cada cambio de turno."""
+    with _reportes_lock:
+        if _programador_turnos['hilo'] is None:
+            hilo = threading.Thread(target=_bucle_programador_turnos, name="reportes-turno", daemon=True)
+            hilo.start()
+            _programador_turnos['hilo'] = hilo
+
+
+@server.route('/api/reports/shift')
+def api_reporte_turno():
+    """Reporte del último turno cerrado (o del último cerrado en `turno`, ISO 8601) en JSON o HTML."""
+    formato = request.args.get('formato', 'json')
+    if formato not in ('json', 'html'):
+        return Response(json.dumps({'error': f"Formato no soportado: {formato}"}), status=400, mimetype='application/json')
+
+    turno = request.args.get('turno')
+    try:
+        momento = ahora_local()
+        if turno:
+            pedido = pd.Timestamp(turno)
+            pedido = pedido.tz_localize(ZONA_HORARIA) if pedido.tzinfo is None else pedido.tz_convert(ZONA_HORARIA)
+            momento = min(momento, pedido.to_pydatetime())  # nunca un turno que aún no cierra
+        inicio, fin = limites_turno(momento)
+    except ValueError:
+        return Response(json.dumps({'error': f"Parámetro turno inválido: {turno}"}), status=400, mimetype='application/json')
+
+    entrada = obtener_reporte_turno(inicio, fin)
+    if entrada['etag'] in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        respuesta = Response(entrada[formato], mimetype='application/json' if formato == 'json' else 'text/html')
+    respuesta.set_etag(entrada['etag'])
+    # Un turno cerrado aún cambia si llegan filas tarde o un backfill: siempre revalidar por ETag
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
 
 
 # ============================================================================
@@ -1022,6 +3797,17 @@ app.layout = html.Div([
             tooltip={"placement": "bottom", "always_visible": True}
         ),
         html.Br(),
+        html.Label(
+            "🧭 Modo de velocímetros:", 
+            style={'color': '#ecf0f1', 'marginTop': '15px'}
+        ),
+        dcc.RadioItems(
+            id='modo-velocimetros',
+            options=[{'label': etiqueta, 'value': modo} for modo, etiqueta in MODOS_VELOCIMETROS.items()],
+            value='tarjetas',
+            labelStyle={'display': 'block', 'color': '#bdc3c7'},
+            inputStyle={'marginRight': '8px'}
+        ),
         dbc.Button(
             "🔄 ACTUALIZAR AHORA", 
             id="btn-actualizar", 
@@ -1029,6 +3815,50 @@ app.layout = html.Div([
             className="btn-primary",
             style={'marginTop': '20px'}
         ),
+        html.Hr(style={'borderColor': '#2c3e50', 'marginTop': '25px'}),
+        html.H6(
+            "🔎 ÁREAS SIN BARCO IDENTIFICADO",
+            style={'color': '#2ecc71', 'marginBottom': '10px'}
+        ),
+        html.Div(id="reporte-sin-identificar"),
+        html.Hr(style={'borderColor': '#2c3e50', 'marginTop': '25px'}),
+        html.H6(
+            "⬇️ EXPORTAR ALERTAS",
+            style={'color': '#2ecc71', 'marginBottom': '10px'}
+        ),
+        dcc.Dropdown(
+            id='export-barco',
+            placeholder="Toda la flota",
+            clearable=True,
+            style={'color': '#2c3e50', 'marginBottom': '10px'}
+        ),
+        dcc.RadioItems(
+            id='export-ventana',
+            options=[{'label': f" {ventana}", 'value': ventana} for ventana in VENTANAS_EXPORTACION],
+            value='24h',
+            inline=True,
+            labelStyle={'color': '#bdc3c7', 'marginRight': '12px'},
+            inputStyle={'marginRight': '4px'}
+        ),
+        dcc.RadioItems(
+            id='export-formato',
+            options=[{'label': f" {formato.upper()}", 'value': formato} for formato in FORMATOS_EXPORTACION],
+            value='csv',
+            inline=True,
+            labelStyle={'color': '#bdc3c7', 'marginRight': '12px'},
+            inputStyle={'marginRight': '4px'}
+        ),
+        html.A(
+            dbc.Button("⬇️ DESCARGAR", color="secondary", style={'marginTop': '10px', 'width': '100%'}),
+            id='export-enlace',
+            href=url_exportacion('csv', '24h'),
+            target="_blank"
+        ),
+        html.A(
+            dbc.Button("📋 REPORTE DE TURNO", color="secondary", outline=True, style={'marginTop': '10px', 'width': '100%'}),
+            href="/api/reports/shift?formato=html",
+            target="_blank"
+        ),
     ], className="sidebar sidebar-left", id="sidebar-left"),
 
     # ========================================================================
@@ -1083,6 +3913,75 @@ app.layout = html.Div([
 
             # Contenedor de velocímetros (ordenado automáticamente)
             html.Div(id='velocimeters-container'),
+            html.Div(
+                dbc.Pagination(
+                    id='paginacion-velocimetros',
+                    max_value=1,
+                    active_page=1,
+                    fully_expanded=False,
+                    previous_next=True
+                ),
+                id='paginacion-contenedor',
+                style={'display': 'none'}
+            ),
+
+            # Heatmap de alertas por barco y hora
+            html.Hr(
+                style={
+                    'borderColor': '#2c3e50', 
+                    'marginTop': '30px', 
+                    'marginBottom': '20px'
+                }
+            ),
+            html.H4(
+                "🕒 ALERTAS POR HORA", 
+                style={'color': '#2ecc71', 'marginBottom': '10px'}
+            ),
+            dcc.RadioItems(
+                id='heatmap-ventana',
+                options=[{'label': f" {etiqueta}", 'value': ventana} for ventana, etiqueta in VENTANAS_HEATMAP.items()],
+                value='24h',
+                inline=True,
+                labelStyle={'color': '#bdc3c7', 'marginRight': '20px'},
+                inputStyle={'marginRight': '6px'}
+            ),
+            dcc.Graph(id='heatmap-horas', config={'displayModeBar': False}),
+
+            # Matriz equipo x barco de toda la flota
+            html.Hr(
+                style={
+                    'borderColor': '#2c3e50', 
+                    'marginTop': '30px', 
+                    'marginBottom': '20px'
+                }
+            ),
+            html.H4(
+                "🔧 EQUIPOS POR BARCO (FLOTA, 24H)", 
+                style={'color': '#2ecc71', 'marginBottom': '10px'}
+            ),
+            dbc.Row([
+                dbc.Col(
+                    dcc.Dropdown(
+                        id='matriz-equipos-alerta',
+                        placeholder="Todos los tipos de alerta",
+                        clearable=True,
+                        style={'color': '#2c3e50'}
+                    ),
+                    width=4
+                ),
+                dbc.Col(
+                    dcc.RadioItems(
+                        id='matriz-equipos-orden',
+                        options=[{'label': f" {etiqueta}", 'value': orden} for orden, etiqueta in ORDENES_MATRIZ_EQUIPOS.items()],
+                        value='total',
+                        inline=True,
+                        labelStyle={'color': '#bdc3c7', 'marginRight': '20px'},
+                        inputStyle={'marginRight': '6px'}
+                    ),
+                    width=8
+                )
+            ], className="mb-2"),
+            dcc.Graph(id='matriz-equipos', config={'displayModeBar': False}),
 
             # Separador
             html.Hr(
@@ -1186,9 +4085,7 @@ app.layout = html.Div([
                 id='sidebar-right-state', 
                 data={'visible': False}
             ),
-            dcc.Store(id='raw-data-store'),
             dcc.Store(id='selected-boat', data=None),
-            dcc.Store(id='prev-alertas-store', data={}),
             dcc.Store(
                 id='highlight-store', 
                 data={'boats': [], 'until': None, 'equipos': {}}
@@ -1216,8 +4113,7 @@ app.layout = html.Div([
     [
         Output('alertas-data', 'data'),
         Output('ultima-actualizacion', 'data'),
-        Output('debug-info-content', 'children'),
-        Output('raw-data-store', 'data')
+        Output('debug-info-content', 'children')
     ],
     [
         Input('btn-actualizar', 'n_clicks'),
@@ -1242,25 +4138,29 @@ def actualizar_datos(n_clicks, n_intervals, intervalo, alertas_data_actual):
 
     # Actualizar si es necesario
     if 'btn-actualizar' in triggered or tiempo_transcurrido >= intervalo or n_intervals == 0:
-        df_raw, error = cargar_datos_google_sheets()
-        
-        if error or df_raw.empty:
-            debug_info = [f"❌ Error: {error if error else 'Sin datos'}"]
-            return dash.no_update, dash.no_update, "\n".join(debug_info), dash.no_update
+        df_raw, df_flota, debug_info = cargar_df_flota()
+        if df_flota.empty:
+            return dash.no_update, dash.no_update, "\n".join(debug_info)
 
-        conteo_alertas, alertas_sin_barco, debug_info = procesar_alertas_ultimas_24h(df_raw)
+        snapshot = publicar_snapshot(df_flota, debug_info, almacen=df_raw is None)
         ultima_actualizacion = ahora
+        version = snapshot['version']
+
+        # Alertas nuevas: evento compartido por versión, unido desde la última versión de este cliente
+        nuevas = nuevas_para_cliente((alertas_data_actual or {}).get('version'), version)
 
         alertas_data = {
-            'conteo_alertas': conteo_alertas,
-            'alertas_sin_barco': alertas_sin_barco,
-            'ultima_actualizacion': ultima_actualizacion.isoformat()
+            'conteo_alertas': snapshot['conteo_alertas'],
+            'nuevas': nuevas,
+            'alertas_sin_barco': snapshot['alertas_sin_barco'],
+            'sin_identificar': resumir_alertas_sin_identificar(df_flota),
+            'ultima_actualizacion': ultima_actualizacion.isoformat(),
+            'version': version
         }
 
-        raw_data = df_raw.to_json(date_format='iso', orient='split') if not df_raw.empty else None
-        return alertas_data, ultima_actualizacion.isoformat(), "\n".join(debug_info), raw_data
+        return alertas_data, ultima_actualizacion.isoformat(), "\n".join(debug_info)
 
-    return dash.no_update, dash.no_update, "Esperando próxima actualización...", dash.no_update
+    return dash.no_update, dash.no_update, "Esperando próxima actualización..."
 
 
 @app.callback(
@@ -1310,81 +4210,63 @@ def actualizar_info_actualizacion(ultima_act_data, intervalo, _tick):
 
 @app.callback(
     [
-        Output('prev-alertas-store', 'data'),
         Output('highlight-store', 'data'),
         Output('alarm-audio', 'src'),
         Output('alarm-audio', 'autoPlay')
     ],
-    Input('alertas-data', 'data'),
-    [
-        State('prev-alertas-store', 'data'),
-        State('raw-data-store', 'data')
-    ]
+    Input('alertas-data', 'data')
 )
-def detectar_nuevas_alertas(alertas_data, prev_data, raw_data):
-    """Detecta nuevas alertas comparando con el estado anterior y activa alarma."""
-    if not alertas_data or 'conteo_alertas' not in alertas_data:
-        return prev_data or {}, {'boats': [], 'until': None, 'equipos': {}}, dash.no_update, False
+def detectar_nuevas_alertas(alertas_data):
+    """Activa el resaltado y la alarma para los barcos con alertas nuevas (por hash de fila) o tasa inusual."""
+    nuevas = (alertas_data or {}).get('nuevas') or {}
+    if not nuevas:
+        return {'boats': [], 'until': None, 'equipos': {}}, dash.no_update, False
 
-    current = alertas_data.get('conteo_alertas', {}) or {}
-    prev = prev_data or {}
+    changed = list(nuevas.keys())
+    equipos_map = {barco: info['equipo'] for barco, info in nuevas.items() if info.get('equipo')}
+    for barco, info in nuevas.items():
+        anomalia = info.get('anomalia')
+        if anomalia:
+            equipos_map[barco] = f"📈 {anomalia.get('equipo') or 'Tasa'}: {anomalia['tasa']}/h (esperado {anomalia['esperado']})"
 
-    # Detectar barcos con incremento de alertas
-    changed = []
-    for barco, val in current.items():
-        try:
-            if int(val) > int(prev.get(barco, 0)):
-                changed.append(barco)
-        except (ValueError, TypeError):
-            pass
-
-    if changed:
-        equipos_map = {}
-        if raw_data:
-            try:
-                df = pd.read_json(raw_data, orient='split')
-                for b in changed:
-                    eq = obtener_equipo_mas_reciente_por_barco(df, b)
-                    if eq:
-                        equipos_map[b] = eq
-            except Exception as e:
-                print(f"Error obteniendo equipos: {e}")
-                equipos_map = {}
+    until = (datetime.now() + timedelta(seconds=10)).isoformat()
+    highlight = {'boats': changed, 'until': until, 'equipos': equipos_map}
 
-        until = (datetime.now() + timedelta(seconds=10)).isoformat()
-        highlight = {'boats': changed, 'until': until, 'equipos': equipos_map}
-
-        # Activar alarma
-        src = f"/assets/alarm.mp3?ts={int(datetime.now().timestamp())}"
-        return current, highlight, src, True
-
-    return current, {'boats': [], 'until': None, 'equipos': {}}, dash.no_update, False
+    # Activar alarma
+    src = f"/assets/alarm.mp3?ts={int(datetime.now().timestamp())}"
+    return highlight, src, True
 
 
 @app.callback(
-    Output('velocimeters-container', 'children'),
+    [
+        Output('velocimeters-container', 'children'),
+        Output('paginacion-velocimetros', 'max_value'),
+        Output('paginacion-contenedor', 'style')
+    ],
     [
         Input('alertas-data', 'data'),
         Input('interval-component', 'n_intervals'),
         Input('highlight-store', 'data'),
-        Input('highlight-timer', 'n_intervals')
+        Input('highlight-timer', 'n_intervals'),
+        Input('modo-velocimetros', 'value'),
+        Input('paginacion-velocimetros', 'active_page')
     ]
 )
-def actualizar_velocimetros(alertas_data, n_intervals, highlight_data, n_ticks):
+def actualizar_velocimetros(alertas_data, n_intervals, highlight_data, n_ticks, modo, pagina):
     """
     Actualiza los velocímetros ordenándolos automáticamente de mayor a menor alertas.
+    Solo se construyen los componentes de la página visible.
     """
+    barcos_flota = obtener_barcos_flota()
     if alertas_data and 'conteo_alertas' in alertas_data:
         conteo = alertas_data.get('conteo_alertas', {})
     else:
-        conteo = {barco: 0 for barco in BARCOS_ATUNEROS}
+        conteo = {barco: 0 for barco in barcos_flota}
 
-    # Ordenar barcos por cantidad de alertas (mayor a menor)
-    barcos_ordenados = sorted(
-        BARCOS_ATUNEROS, 
-        key=lambda x: int(conteo.get(x, 0)), 
-        reverse=True
-    )
+    conteo_int = {barco: int(conteo.get(barco, 0)) for barco in barcos_flota}
+    barcos_ordenados = ordenar_barcos_por_alertas(barcos_flota, conteo_int)
+    barcos_pagina, total_paginas = paginar_barcos(barcos_ordenados, pagina)
+    estilo_paginacion = {'display': 'flex', 'justifyContent': 'center'} if total_paginas > 1 else {'display': 'none'}
 
     # Datos de resaltado
     highlight_boats = set((highlight_data or {}).get('boats', []))
@@ -1398,73 +4280,68 @@ def actualizar_velocimetros(alertas_data, n_intervals, highlight_data, n_ticks):
         except Exception:
             still_on = False
 
-    # Crear filas con tarjetas ordenadas
+    # Modo figura única: una sola instancia de Plotly para la página visible
+    if modo == 'figura':
+        resaltados = {b: equipos_map.get(b) for b in barcos_pagina if b in highlight_boats} if still_on else {}
+        fig = crear_grilla_velocimetros(barcos_pagina, conteo_int, resaltados)
+        grafico = dcc.Graph(
+            id={'type': 'flota-grid', 'index': 'flota'},
+            figure=fig,
+            config={'displayModeBar': False},
+            style={'width': '100%'}
+        )
+        return grafico, total_paginas, estilo_paginacion
+
+    # Con flotas grandes, los barcos con pocas alertas se muestran como tiles compactos.
+    # Se agrupan en tramos consecutivos para respetar el orden global por alertas.
+    compactar = len(barcos_flota) > MAX_BARCOS_SIN_COMPACTAR
+    tramos = []
+    for barco in barcos_pagina:
+        is_highlight = still_on and (barco in highlight_boats)
+        es_tile = compactar and conteo_int[barco] <= MAX_ALERTAS_TILE_COMPACTO and not is_highlight
+        if tramos and tramos[-1][0] == es_tile:
+            tramos[-1][1].append(barco)
+        else:
+            tramos.append((es_tile, [barco]))
+
+    # Tendencia de 24h por barco desde los contadores horarios (sin recorrer DataFrames)
+    barcos_serie, serie, _ = serie_horaria_barcos(24)
+    fila_serie = {barco: i for i, barco in enumerate(barcos_serie)}
+
+    # Crear filas con tarjetas (y bloques de tiles) en el orden de alertas
     rows = []
-    for fila in range(3):
-        cols = []
-        inicio = fila * 5
-        fin = min(inicio + 5, len(barcos_ordenados))
-
-        for barco in barcos_ordenados[inicio:fin]:
-            alertas = int(conteo.get(barco, 0))
-            fig = crear_velocimetro_24h(alertas, barco, max_valor=30)
-
-            is_highlight = still_on and (barco in highlight_boats)
-            equipo_alerta = equipos_map.get(barco)
+    for es_tile, barcos_tramo in tramos:
+        if es_tile:
+            rows.append(html.Div(
+                [crear_tile_compacto(barco, conteo_int[barco]) for barco in barcos_tramo],
+                className="tiles-compactos"
+            ))
+            continue
 
-            cols.append(
-                dbc.Col([
-                    html.Div(
-                        [
-                            html.H4(
-                                barco,
-                                className="barco-title",
-                                style={
-                                    'textAlign': 'center',
-                                    'color': '#ecf0f1',
-                                    'marginBottom': '2px',
-                                    'fontSize': '18px'
-                                }
-                            ),
-                            html.Div(
-                                equipo_alerta if (is_highlight and equipo_alerta) else "",
-                                className="equipo-highlight",
-                                style={
-                                    'display': 'block' if (is_highlight and equipo_alerta) else 'none'
-                                }
-                            ),
-                            html.Div(
-                                dcc.Graph(
-                                    figure=fig,
-                                    config={'displayModeBar': False},
-                                    style={'width': '100%', 'height': '176px'}
-                                ),
-                                style={'width': '100%'}
-                            )
-                        ],
-                        id={'type': 'barco-card', 'index': barco},
-                        n_clicks=0,
-                        className=("gauge-card gauge-highlight" if is_highlight else "gauge-card"),
-                        style={
-                            'display': 'flex',
-                            'flexDirection': 'column',
-                            'justifyContent': 'flex-start',
-                            'alignItems': 'center',
-                            'margin': '0px 10px',
-                        }
+        for inicio in range(0, len(barcos_tramo), COLUMNAS_GRILLA):
+            cols = []
+            for barco in barcos_tramo[inicio:inicio + COLUMNAS_GRILLA]:
+                is_highlight = still_on and (barco in highlight_boats)
+                cols.append(
+                    dbc.Col(
+                        crear_tarjeta_velocimetro(
+                            barco, conteo_int[barco], is_highlight, equipos_map.get(barco),
+                            serie[fila_serie[barco]] if barco in fila_serie else None
+                        ),
+                        width=2,
+                        className="gauge-col"
                     )
-                ], width=2, className="gauge-col")
-            )
+                )
 
-        rows.append(
-            dbc.Row(
-                cols, 
-                className="gauge-row mb-5 g-4", 
-                justify='center'
+            rows.append(
+                dbc.Row(
+                    cols, 
+                    className="gauge-row mb-5 g-4", 
+                    justify='center'
+                )
             )
-        )
 
-    return rows
+    return rows, total_paginas, estilo_paginacion
 
 
 @app.callback(
@@ -1510,6 +4387,115 @@ def actualizar_estadisticas(alertas_data):
     )
 
 
+@app.callback(
+    Output('reporte-sin-identificar', 'children'),
+    Input('alertas-data', 'data')
+)
+def actualizar_reporte_sin_identificar(alertas_data):
+    """Muestra los textos de Área más frecuentes sin barco oficial y su sugerencia."""
+    resumen = (alertas_data or {}).get('sin_identificar') or []
+    if not resumen:
+        return html.P(
+            "Todas las alertas tienen barco identificado.",
+            style={'color': '#bdc3c7', 'fontSize': '13px'}
+        )
+
+    filas = []
+    for item in resumen:
+        sugerencia = (
+            f"{item['sugerencia']} ({item['puntaje']:.0%})" if item['sugerencia']
+            else f"— ({item['puntaje']:.0%})"
+        )
+        filas.append(html.Tr([
+            html.Td(item['area'], style={'fontSize': '12px', 'wordBreak': 'break-word'}),
+            html.Td(item['cantidad'], style={'textAlign': 'center', 'color': '#f1c40f'}),
+            html.Td(sugerencia, style={'fontSize': '12px', 'color': '#2ecc71'})
+        ]))
+
+    return html.Table([
+        html.Thead(html.Tr([
+            html.Th("Área"),
+            html.Th("Cant.", style={'textAlign': 'center'}),
+            html.Th("Sugerencia")
+        ])),
+        html.Tbody(filas)
+    ], className="equipo-table")
+
+
+@app.callback(
+    Output('heatmap-horas', 'figure'),
+    [
+        Input('alertas-data', 'data'),
+        Input('heatmap-ventana', 'value')
+    ]
+)
+def actualizar_heatmap_horas(alertas_data, ventana):
+    """Actualiza el heatmap barco x hora desde los contadores horarios."""
+    version = (alertas_data or {}).get('version')
+    # El eje horario corre con el reloj aunque la versión de datos no cambie
+    clave = ('figura', version, 'heatmap', ventana, ahora_ns() // _NS_POR_HORA)
+    figura = cache_obtener(clave) if version else None
+    if figura is None:
+        conteo = (alertas_data or {}).get('conteo_alertas', {})
+        barcos_ordenados = ordenar_barcos_por_alertas(obtener_barcos_flota(), conteo)
+        figura = crear_heatmap_horas(barcos_ordenados, ventana)
+        if version:
+            cache_guardar(clave, figura)
+    return figura
+
+
+@app.callback(
+    [
+        Output('matriz-equipos', 'figure'),
+        Output('matriz-equipos-alerta', 'options')
+    ],
+    [
+        Input('alertas-data', 'data'),
+        Input('matriz-equipos-alerta', 'value'),
+        Input('matriz-equipos-orden', 'value')
+    ]
+)
+def actualizar_matriz_equipos(alertas_data, alerta, orden):
+    """
+    Actualiza la matriz equipo x barco de la versión que muestra el cliente,
+    desde la cache (sin recargar datos en el hilo del request).
+    """
+    version = (alertas_data or {}).get('version')
+    clave = ('figura', version, 'matriz', alerta, orden or 'total')
+    resultado = cache_obtener(clave) if version else None
+    if resultado is None:
+        matriz = obtener_matriz_version(version)
+        conteo = (alertas_data or {}).get('conteo_alertas', {})
+        barcos_ordenados = ordenar_barcos_por_alertas(matriz['barcos'], conteo)
+        opciones = [{'label': matriz['alertas'][i], 'value': matriz['alertas'][i]} for i in np.unique(matriz['alerta'])]
+        resultado = (crear_figura_matriz_equipos(matriz, barcos_ordenados, alerta, orden or 'total'), opciones)
+        if version:
+            cache_guardar(clave, resultado)
+    return resultado
+
+
+@app.callback(
+    Output('export-barco', 'options'),
+    Input('alertas-data', 'data')
+)
+def actualizar_opciones_exportacion(alertas_data):
+    """Lista de barcos de la flota para el selector de exportación."""
+    return [{'label': barco, 'value': barco} for barco in obtener_barcos_flota()]
+
+
+@app.callback(
+    Output('export-enlace', 'href'),
+    [
+        Input('export-barco', 'value'),
+        Input('export-ventana', 'value'),
+        Input('export-formato', 'value')
+    ]
+)
+def actualizar_enlace_exportacion(barco, ventana, formato):
+    """Arma la URL de descarga según barco, ventana y formato elegidos."""
+    return url_exportacion(formato or 'csv', ventana or '24h', barco)
+
+
 @app.callback(
     Output('interval-component', 'interval'),
     Input('intervalo-slider', 'value')
@@ -1578,18 +4564,19 @@ def toggle_sidebar_left(left_clicks, overlay_clicks, left_state, right_state):
     ],
     [
         Input({'type': 'barco-card', 'index': ALL}, 'n_clicks'),
+        Input({'type': 'flota-grid', 'index': ALL}, 'clickData'),
         Input('close-sidebar-right', 'n_clicks'),
         Input('sidebar-overlay', 'n_clicks')
     ],
     [
-        State('raw-data-store', 'data'),
+        State('alertas-data', 'data'),
         State('selected-boat', 'data'),
         State('sidebar-left-state', 'data'),
         State('sidebar-right-state', 'data')
     ],
     prevent_initial_call=True
 )
-def toggle_sidebar_right(card_clicks, close_clicks, overlay_clicks, raw_data, selected_boat, left_state, right_state):
+def toggle_sidebar_right(card_clicks, grid_clicks, close_clicks, overlay_clicks, alertas_data, selected_boat, left_state, right_state):
     """Controla la apertura/cierre de la sidebar derecha con detalles del barco."""
     ctx = dash.callback_context
     if not ctx.triggered:
@@ -1601,102 +4588,29 @@ def toggle_sidebar_right(card_clicks, close_clicks, overlay_clicks, raw_data, se
 
     left_visible = left_state.get('visible', False) if left_state else False
 
-    # Click en una tarjeta de barco
+    # Click en una tarjeta de barco o en la grilla de figura única
     if trigger_id.startswith('{'):
         if not trigger_value:
             return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
         try:
             barco_info = json.loads(trigger_id)
-            barco_seleccionado = barco_info['index']
+            if barco_info.get('type') == 'flota-grid':
+                barco_seleccionado = trigger_value['points'][0]['customdata']
+            else:
+                barco_seleccionado = barco_info['index']
 
-            df_detalle = pd.DataFrame()
-            if raw_data:
+            # Detalle precalculado para la versión actual; si no existe, consulta indexada al almacén local
+            version = (alertas_data or {}).get('version')
+            detalle = obtener_detalle_cacheado(version, barco_seleccionado)
+            if detalle is None:
                 try:
-                    df = pd.read_json(raw_data, orient='split')
-                    df_detalle = obtener_detalle_barco_24h(df, barco_seleccionado)
+                    desde = ahora_local() - timedelta(hours=24)
+                    detalle = construir_payload_detalle(detalle_barco_store(barco_seleccionado, desde), barco_seleccionado)
                 except Exception as e:
                     print(f"Error al cargar datos: {e}")
 
-            if df_detalle.empty:
-                contenido = html.Div([
-                    html.H5(
-                        f"{barco_seleccionado}", 
-                        style={
-                            'color': '#2ecc71', 
-                            'marginBottom': '15px', 
-                            'fontSize': '20px'
-                        }
-                    ),
-                    html.P(
-                        f"No hay alertas registradas para {barco_seleccionado} en las últimas 24 horas.",
-                        style={
-                            'color': '#bdc3c7', 
-                            'textAlign': 'center', 
-                            'padding': '30px', 
-                            'fontSize': '16px'
-                        }
-                    )
-                ])
-            else:
-                fig = crear_grafico_barras_apilado(df_detalle, barco_seleccionado)
-                total_alertas = int(df_detalle['Cantidad'].sum())
-                equipos_afectados = int(df_detalle['Activo'].nunique())
-                tipos_alerta = int(df_detalle['Alerta'].nunique())
-
-                tabla_detallada = crear_tabla_equipos_detallada(df_detalle)
-
-                contenido = html.Div([
-                    html.H5(
-                        f"{barco_seleccionado}", 
-                        style={
-                            'color': '#2ecc71', 
-                            'marginBottom': '20px', 
-                            'fontSize': '24px', 
-                            'textAlign': 'center'
-                        }
-                    ),
-                    html.Div([
-                        html.H6(
-                            "Resumen de Alertas (Últimas 24 horas)", 
-                            style={
-                                'color': '#2ecc71', 
-                                'marginBottom': '15px', 
-                                'fontSize': '18px'
-                            }
-                        ),
-                        html.Div([
-                            html.Div([
-                                html.Div(str(total_alertas), className="stat-value"), 
-                                html.Div("Total Alertas", className="stat-label")
-                            ], className="stat-item"),
-                            html.Div([
-                                html.Div(str(equipos_afectados), className="stat-value"), 
-                                html.Div("Equipos Afectados", className="stat-label")
-                            ], className="stat-item"),
-                            html.Div([
-                                html.Div(str(tipos_alerta), className="stat-value"), 
-                                html.Div("Tipos de Alerta", className="stat-label")
-                            ], className="stat-item"),
-                        ], className="stats-grid")
-                    ], className="alertas-resumen"),
-
-                    html.Hr(style={'borderColor': '#2c3e50', 'margin': '20px 0'}),
-
-                    dcc.Graph(
-                        figure=fig,
-                        config={
-                            'displayModeBar': True, 
-                            'displaylogo': False, 
-                            'responsive': True
-                        },
-                        className="graph-container"
-                    ),
-
-                    html.Hr(style={'borderColor': '#2c3e50', 'margin': '25px 0'}),
-
-                    tabla_detallada
-                ])
+            contenido = crear_contenido_detalle(barco_seleccionado, detalle)
 
             container_class = "sidebar-open-right" if not left_visible else "sidebar-open-left sidebar-open-right"
             overlay_class = "overlay visible"
@@ -1733,10 +4647,250 @@ def toggle_sidebar_right(card_clicks, close_clicks, overlay_clicks, raw_data, se
     return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
 
+# ============================================================================
+# API JSON DE SOLO LECTURA
+# ============================================================================
+
+def elegir_codificacion() -> Optional[str]:
+    """'br' si el cliente lo acepta y brotli está instalado; si no 'gzip' o None."""
+    if brotli is not None and 'br' in request.accept_encodings:
+        return 'br'
+    if 'gzip' in request.accept_encodings:
+        return 'gzip'
+    return None
+
+
+def comprimir_cuerpo(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == 'br':
+        return brotli.compress(cuerpo, quality=NIVEL_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+
+
+@server.after_request
+def comprimir_respuesta(respuesta: Response) -> Response:
+    """Comprime las respuestas JSON de los callbacks de Dash y de la API que no vengan ya comprimidas."""
+    if (not request.path.startswith(RUTAS_COMPRIMIBLES) or respuesta.status_code != 200
+            or respuesta.direct_passthrough or respuesta.is_streamed
+            or 'Content-Encoding' in respuesta.headers or respuesta.mimetype != 'application/json'):
+        return respuesta
+
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = elegir_codificacion()
+    if codificacion is None or respuesta.content_length is None or respuesta.content_length < MIN_BYTES_COMPRESION:
+        return respuesta
+
+    respuesta.set_data(comprimir_cuerpo(respuesta.get_data(), codificacion))
+    respuesta.headers['Content-Encoding'] = codificacion
+    return respuesta
+
+
+def _respuesta_api(clave: str, construir) -> Response:
+    """
+    Responde desde el snapshot en memoria. El cuerpo (y sus versiones
+    comprimidas) se serializa una vez por versión de datos y clave; el ETag
+    deriva de ambas, así que los sondeos repetidos reciben 304 sin tocar pandas.
+    """
+    snapshot = obtener_snapshot()
+    version = snapshot.get('version')
+    if not version:
+        return Response(json.dumps({'error': 'Sin datos disponibles'}), status=503, mimetype='application/json')
+
+    entrada = cache_obtener(('api', version, clave))
+    if entrada is None:
+        cuerpo, status = construir(snapshot)
+        cuerpo = json.dumps(cuerpo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.blake2b(f"{version}|{clave}".encode('utf-8'), digest_size=8).hexdigest()
+        entrada = {
+            'cuerpo': cuerpo,
+            'comprimido': {},
+            'etag': etag,
+            'status': status
+        }
+        cache_guardar(('api', version, clave), entrada)
+
+    codificacion = elegir_codificacion() if len(entrada['cuerpo']) >= MIN_BYTES_COMPRESION else None
+    if entrada['status'] == 200 and entrada['etag'] in request.if_none_match:
+        respuesta = Response(status=304)
+    elif codificacion is not None:
+        if codificacion not in entrada['comprimido']:
+            entrada['comprimido'][codificacion] = comprimir_cuerpo(entrada['cuerpo'], codificacion)
+            cache_sumar_tamano(('api', version, clave), entrada, len(entrada['comprimido'][codificacion]))
+        respuesta = Response(entrada['comprimido'][codificacion], status=entrada['status'], mimetype='application/json')
+        respuesta.headers['Content-Encoding'] = codificacion
+    else:
+        respuesta = Response(entrada['cuerpo'], status=entrada['status'], mimetype='application/json')
+
+    respuesta.set_etag(entrada['etag'])
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    respuesta.headers['X-Version-Datos'] = version
+    return respuesta
+
+
+@server.route('/api/fleet/counts')
+def api_conteo_flota():
+    """Conteo de alertas 24h por barco."""
+    def construir(snapshot):
+        indice = obtener_registro_flotas()
+        return {
+            'version': snapshot['version'],
+            'actualizado': snapshot['actualizado'],
+            'conteo': snapshot['conteo_alertas'],
+            'flota_de_barco': {barco: indice['flota_de_barco'].get(barco) for barco in snapshot['conteo_alertas']},
+            'alertas_sin_barco': snapshot['alertas_sin_barco']
+        }, 200
+
+    return _respuesta_api('conteo', construir)
+
+
+@server.route('/api/boats/<nombre>/detail')
+def api_detalle_barco(nombre):
+    """Detalle 24h de un barco (estadísticas y alertas por equipo), desde el precálculo."""
+    barco = normalizar_nombre_barco(nombre)
+
+    def construir(snapshot):
+        if barco not in obtener_barcos_flota():
+            return {'error': f"Barco desconocido: {nombre}"}, 404
+        detalle = obtener_detalle_cacheado(snapshot['version'], barco)
+        if detalle is None:
+            detalle = construir_detalle_barco(
+                snapshot['df_flota'][snapshot['df_flota']['Barco_Normalizado'] == barco], barco
+            )
+        return {
+            'version': snapshot['version'],
+            'barco': barco,
+            'estadisticas': detalle.get('estadisticas', {'total_alertas': 0, 'equipos_afectados': 0, 'tipos_alerta': 0}),
+            'equipos': detalle.get('tabla', []),
+            'intervalos': intervalos_al_momento(detalle.get('intervalos', []))
+        }, 200
+
+    # Silencio y racha dependen de la hora: el cuerpo cacheado se renueva por minuto
+    minuto = ahora_local().strftime('%Y%m%d%H%M')
+    return _respuesta_api(f"detalle|{barco or nombre}|{minuto}", construir)
+
+
+@server.route('/api/alerts')
+def api_alertas():
+    """Alertas de la flota en 24h posteriores a `since` (ISO 8601), más recientes al final."""
+    since = request.args.get('since')
+    try:
+        desde = pd.Timestamp(since) if since else None
+    except ValueError:
+        return Response(json.dumps({'error': f"Parámetro since inválido: {since}"}), status=400, mimetype='application/json')
+    if desde is not None and desde.tzinfo is None:
+        desde = desde.tz_localize(ZONA_HORARIA)
+
+    def construir(snapshot):
+        df = snapshot['df_flota']
+        if desde is not None:
+            fechas = df['Fecha'].astype('int64').to_numpy()
+            df = df.iloc[int(np.searchsorted(fechas, _fecha_a_ns(desde), side='right')):]
+        truncado = len(df) > MAX_ALERTAS_API
+        df = df.iloc[-MAX_ALERTAS_API:]
+        return {
+            'version': snapshot['version'],
+            'truncado': truncado,
+            'alertas': [
+                {'id': str(i), 'fecha': f.isoformat(), 'barco': b, 'area': a, 'activo': ac, 'alerta': al}
+                for i, f, b, a, ac, al in zip(
+                    df['Id'], df['Fecha'],
+                    df['Barco_Normalizado'].astype(object).where(df['Barco_Normalizado'].notna(), None),
+                    df['Area'].astype(str), df['Activo'].astype(str), df['Alerta'].astype(str)
+                )
+            ]
+        }, 200
+
+    return _respuesta_api(f"alertas|{desde.value if desde is not None else ''}", construir)
+
+
+@server.route('/api/metrics')
+def api_metricas():
+    """Memoria del proceso (RSS y estructuras) del último ciclo de vigilancia, o medida en el momento."""
+    with _watchdog_lock:
+        reporte = _watchdog['reporte']
+    if not reporte or request.args.get('actual'):
+        reporte = revisar_memoria()
+    respuesta = Response(json.dumps(reporte, ensure_ascii=False), mimetype='application/json')
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+# ============================================================================
+# SERVIDOR DE PRODUCCIÓN (WSGI)
+# ============================================================================
+
+# Locks de módulo que un hilo del maestro (pool de detalles, compactación del
+# histórico, watchdog, programador de turnos) puede tener tomados al hacer fork
+_LOCKS_MODULO = (
+    '_reloj_replay_lock', '_registro_lock', '_historial_pendiente_lock', '_estado_fuentes_lock',
+    '_descarga_lock', '_replay_lock', '_cache_memoria_lock', '_detalles_lock', '_escritura_store_lock',
+    '_eventos_lock', '_compactacion_lock', '_contadores_lock', '_snapshot_lock', '_snapshot_refresco_lock',
+    '_watchdog_lock', '_revision_memoria_lock', '_reportes_lock'
+)
+
+
+def _antes_de_fork() -> None:
+    _revision_memoria_lock.acquire()
+
+
+def _tras_fork_padre() -> None:
+    _revision_memoria_lock.release()
+
+
+def _tras_fork_hijo() -> None:
+    """
+    Un worker hereda la memoria del maestro (snapshot, cache, detalles ya
+    calculados) pero no sus hilos ni su conexión SQLite: se rehacen aquí.
+    Un lock tomado por un hilo del maestro en el instante del fork quedaría
+    cerrado para siempre en el hijo (ese hilo no existe), así que todos los
+    locks del módulo se reemplazan por locks nuevos.
+    """
+    global _ejecutor_detalles, _conexiones_store
+    for nombre in _LOCKS_MODULO:
+        globals()[nombre] = threading.Lock()
+    _ejecutor_detalles = ThreadPoolExecutor(max_workers=HILOS_DETALLE, thread_name_prefix="detalle-barco")
+    _conexiones_store = threading.local()
+    _watchdog['hilo'] = None
+    _programador_turnos['hilo'] = None
+    # _compactacion['hilo'] se hereda a propósito: la compactación corre solo en el maestro
+    with _cache_memoria_lock:
+        for clave in [c for c, e in _cache_memoria.items()
+                      if c[0] == 'detalles' and not all(f.done() for f in e['valor'].values())]:
+            del _cache_memoria[clave]
+
+
+def crear_servidor(precargar: bool = True):
+    """
+    Fábrica WSGI de producción (sin modo debug ni dev tools). Con `precargar`
+    descarga los datos, publica el snapshot y espera los detalles por barco
+    en el proceso maestro, así con `gunicorn --preload` los workers nacen
+    con la cache caliente en vez de repetir el trabajo cada uno. La
+    compactación del histórico arranca también aquí y los workers la heredan
+    ya marcada, así que corre en un solo proceso.
+    """
+    if precargar:
+        iniciar_compactacion_historico()
+        snapshot = obtener_snapshot()
+        if snapshot.get('version'):
+            for futuro in (cache_obtener(('detalles', snapshot['version'])) or {}).values():
+                futuro.exception()
+            print(f"Snapshot precargado: versión {snapshot['version']}, {len(snapshot['df_flota'])} alertas")
+
+    if hasattr(os, 'register_at_fork') and not _watchdog.get('fork_registrado'):
+        os.register_at_fork(before=_antes_de_fork, after_in_parent=_tras_fork_padre,
+                            after_in_child=_tras_fork_hijo)
+        _watchdog['fork_registrado'] = True
+    return server
+
+
 # ============================================================================
 # PUNTO DE ENTRADA
 # ============================================================================
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8050)
+    if MODO_REPLAY:
+        print(f"Modo replay: {MODO_REPLAY} a {VELOCIDAD_REPLAY:g}x desde {ahora_local().isoformat()}")
+    # Solo para desarrollo local; en producción usar wsgi.py (gunicorn --preload wsgi:server)
+    app.run(debug=os.environ.get('NIRSA_DEBUG') == '1', port=8050)
+
 
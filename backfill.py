@@ -0,0 +1,135 @@
+"""
+Carga histórica de exportaciones archivadas del sheet de alertas (CSV/XLSX)
+
+Uso:
+    python backfill.py RUTA [RUTA ...] [--procesos N] [--sin-historico]
+
+RUTA puede ser un archivo .csv/.xlsx o una carpeta (se recorre completa); los
+.xls antiguos (Excel 97-2003) hay que convertirlos antes a .xlsx o .csv.
+Cada archivo se parsea en un proceso aparte con el mismo mapeo de columnas y
+parseo de fechas que la ingesta del dashboard; los barcos se normalizan con
+el registro de flotas y las filas se deduplican por hash antes de cargarlas
+en el almacén local (y en el histórico Parquet).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import app
+
+EXTENSIONES_ARCHIVO = ('.csv', '.xlsx')  # .xls requeriría xlrd
+
+
+def listar_archivos(rutas: List[str]) -> List[str]:
+    """Expande carpetas a sus archivos CSV/XLSX, ordenados por nombre."""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, _, nombres in os.walk(ruta):
+                archivos.extend(os.path.join(raiz, n) for n in nombres if n.lower().endswith(EXTENSIONES_ARCHIVO))
+        elif ruta.lower().endswith(EXTENSIONES_ARCHIVO):
+            archivos.append(ruta)
+        else:
+            print(f"Ignorado (extensión no soportada): {ruta}")
+    return sorted(set(archivos))
+
+
+def leer_archivo(ruta: str) -> pd.DataFrame:
+    """Lee una exportación del sheet; en Excel se unen todas las hojas."""
+    if ruta.lower().endswith('.csv'):
+        return pd.read_csv(ruta)
+    hojas = pd.read_excel(ruta, sheet_name=None)
+    return pd.concat(
+        [app.alinear_columnas_fuente(df) for df in hojas.values() if not df.empty],
+        ignore_index=True
+    ) if hojas else pd.DataFrame()
+
+
+def procesar_archivo(ruta: str) -> Tuple[str, int, Optional[pd.DataFrame], Optional[str]]:
+    """
+    Se ejecuta en un proceso del pool: lee, normaliza el esquema, identifica
+    la flota y calcula el hash de cada fila. Retorna (ruta, filas leídas,
+    df_flota o None, error o None).
+    """
+    try:
+        df_leido = leer_archivo(ruta)
+    except Exception as e:
+        return ruta, 0, None, f"No se pudo leer: {e}"
+
+    df_raw = app.alinear_columnas_fuente(df_leido)
+    if 'Fecha' not in df_raw.columns or 'Area' not in df_raw.columns:
+        return ruta, len(df_leido), None, f"Columnas faltantes. Disponibles: {list(df_leido.columns)}"
+
+    df, debug = app.normalizar_esquema_ingesta(df_raw)
+    if df.empty:
+        return ruta, len(df_raw), None, "; ".join(debug)
+
+    df_flota = app.identificar_flota(df)
+    if df_flota.empty:
+        return ruta, len(df_raw), None, None
+
+    df_flota = df_flota.assign(Id=app.calcular_hash_filas(df_flota))
+    return ruta, len(df_raw), df_flota[~df_flota['Id'].duplicated()], None
+
+
+def cargar_archivos(archivos: List[str], procesos: int, historico: bool = True) -> Dict:
+    """Parsea los archivos en paralelo y carga cada resultado en el almacén a medida que llega."""
+    resumen = {'archivos': len(archivos), 'errores': 0, 'filas_leidas': 0, 'filas_flota': 0, 'filas_nuevas': 0}
+    inicio = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        futuros = [ejecutor.submit(procesar_archivo, ruta) for ruta in archivos]
+        for futuro in as_completed(futuros):
+            ruta, leidas, df_flota, error = futuro.result()
+            resumen['filas_leidas'] += leidas
+            if error:
+                resumen['errores'] += 1
+                print(f"❌ {ruta}: {error}")
+                continue
+            if df_flota is None:
+                print(f"⚪ {ruta}: {leidas} filas, ninguna de la flota")
+                continue
+
+            # SQLite admite un solo escritor: la carga se hace en el proceso principal
+            df_nuevas = app.guardar_alertas_store(df_flota)
+            if historico:
+                app.escribir_historico_parquet(df_nuevas)
+            resumen['filas_flota'] += len(df_flota)
+            resumen['filas_nuevas'] += len(df_nuevas)
+            print(f"✅ {ruta}: {leidas} filas, {len(df_flota)} de la flota, {len(df_nuevas)} nuevas")
+
+    if historico and resumen['filas_nuevas']:
+        app.compactar_historico()
+
+    segundos = time.perf_counter() - inicio
+    resumen['segundos'] = round(segundos, 2)
+    resumen['filas_por_segundo'] = round(resumen['filas_leidas'] / segundos) if segundos > 0 else 0
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga histórica de exportaciones del sheet de alertas")
+    parser.add_argument('rutas', nargs='+', help="Archivos .csv/.xlsx o carpetas con exportaciones")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sin-historico', action='store_true', help="Solo cargar el almacén SQLite")
+    args = parser.parse_args()
+
+    archivos = listar_archivos(args.rutas)
+    if not archivos:
+        sys.exit("No se encontraron archivos CSV/XLSX")
+
+    print(f"Cargando {len(archivos)} archivos con {args.procesos} procesos en {app.RUTA_ALERTAS_DB}")
+    resumen = cargar_archivos(archivos, args.procesos, historico=not args.sin_historico)
+    print(resumen)
+    if resumen['errores']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmarks del Dashboard de Monitoreo - Flota Atunera NIRSA
+
+Uso:
+    python benchmarks.py velocimetros [--repeticiones N]
+    python benchmarks.py memoria [--filas N]
+    python benchmarks.py arranque [--repeticiones N]
+    python benchmarks.py presupuestos
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import pandas as pd
+import plotly
+
+import app
+
+
+def _medir(funcion, repeticiones: int) -> float:
+    """Retorna el tiempo medio en milisegundos de ejecutar la función."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def _bytes_json(componente) -> int:
+    """Tamaño en bytes del componente tal como viaja al navegador."""
+    return len(json.dumps(componente, cls=plotly.utils.PlotlyJSONEncoder).encode('utf-8'))
+
+
+def bench_velocimetros(repeticiones: int) -> List[Dict]:
+    """Compara payload y costo de actualización de los modos de velocímetros."""
+    barcos = app.obtener_barcos_flota()
+    conteo = {barco: (i * 7) % 15 for i, barco in enumerate(barcos)}
+    alertas_data = {'conteo_alertas': conteo, 'alertas_sin_barco': 0}
+    highlight = {'boats': [], 'until': None, 'equipos': {}}
+
+    resultados = []
+    for modo in app.MODOS_VELOCIMETROS:
+        def render():
+            return app.actualizar_velocimetros(alertas_data, 0, highlight, 0, modo, 1)[0]
+
+        resultados.append({
+            'modo': modo,
+            'payload_bytes': _bytes_json(render()),
+            'render_ms': round(_medir(render, repeticiones), 2),
+            'instancias_plotly': 1 if modo == 'figura' else len(barcos)
+        })
+    return resultados
+
+
+def generar_hoja_sintetica(filas: int, horas: int = 48, semilla: int = 7) -> pd.DataFrame:
+    """Genera un DataFrame con el formato del sheet de alertas (texto, como llega del CSV)."""
+    rnd = random.Random(semilla)
+    barcos = app.obtener_barcos_flota()
+    equipos = ['MOTOR PRINCIPAL', 'GENERADOR 1', 'GENERADOR 2', 'BOMBA HIDRÁULICA', 'COMPRESOR RSW']
+    alertas = ['Vibración alta', 'Temperatura alta', 'Desbalance']
+    ahora = datetime.now(app.ZONA_HORARIA).replace(tzinfo=None)
+
+    return pd.DataFrame({
+        'Fecha': [
+            (ahora - timedelta(seconds=rnd.randint(0, horas * 3600))).strftime('%d/%m/%Y %H:%M:%S')
+            for _ in range(filas)
+        ],
+        'Área': [f"🐟 FLOTA ATUNERA (BARCO {rnd.choice(barcos)})" for _ in range(filas)],
+        'Activo': [rnd.choice(equipos) for _ in range(filas)],
+        'Alerta': [rnd.choice(alertas) for _ in range(filas)],
+        'Valor': [round(rnd.uniform(0, 20), 2) for _ in range(filas)],
+        'Observación': [f"Lectura sensor {rnd.randint(1, 40)}" for _ in range(filas)],
+    })
+
+
+def _mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def bench_memoria(filas: int) -> Dict:
+    """Memoria por 100k filas: esquema anterior (copia completa + Fecha_Original) vs ingesta compacta."""
+    df_raw = generar_hoja_sintetica(filas)
+
+    # Esquema anterior: copia de todas las columnas, texto como object y Fecha_Original duplicada
+    anterior = df_raw.rename(columns={'Área': 'Area'}).copy()
+    anterior['Fecha_Original'] = anterior['Fecha']
+    anterior['Fecha'] = pd.to_datetime(anterior['Fecha'], format='%d/%m/%Y %H:%M:%S')
+
+    inicio = time.perf_counter()
+    compacto, _ = app.normalizar_esquema_ingesta(df_raw)
+    ms = (time.perf_counter() - inicio) * 1000
+
+    escala = 100_000 / filas
+    return {
+        'filas': filas,
+        'anterior_mb_100k': round(float(_mb(anterior)) * escala, 2),
+        'compacto_mb_100k': round(float(_mb(compacto)) * escala, 2),
+        'ingesta_ms': round(ms, 1)
+    }
+
+
+def bench_arranque(repeticiones: int) -> Dict:
+    """Tiempo de importar app.py en un proceso nuevo y los módulos que más aportan (python -X importtime)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import app'], check=True, capture_output=True)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            check=True, capture_output=True, text=True).stderr
+    modulos, propio_ms = [], 0.0
+    for linea in salida.splitlines():
+        partes = linea.split('|')
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            nombre = partes[2].rstrip()
+            if nombre.strip() == 'app':
+                propio_ms = int(partes[0].split(':')[1]) / 1000
+            # Solo importaciones directas de app (primer nivel de indentación)
+            elif len(nombre) - len(nombre.lstrip()) <= 3:
+                modulos.append((nombre.strip(), int(partes[1]) / 1000))
+
+    tiempos.sort()
+    return {
+        'import_ms_mediana': round(tiempos[len(tiempos) // 2], 1),
+        'import_ms_min': round(tiempos[0], 1),
+        'modulo_app_ms': round(propio_ms, 1),
+        'mas_lentos_ms': [(m, round(ms, 1)) for m, ms in sorted(modulos, key=lambda x: -x[1])[:8]]
+    }
+
+
+# Bytes máximos por salida de callback sobre generar_hoja_sintetica(FILAS_PRESUPUESTO): JSON sin
+# comprimir (clientes sin Accept-Encoding y costo de serializar) y con gzip (lo que viaja por la red)
+FILAS_PRESUPUESTO = 20_000
+PRESUPUESTOS_BYTES = {
+    'alertas-data': 4_000,
+    'velocimetros-tarjetas': 180_000,
+    'velocimetros-figura': 32_000,
+    'detalle-barco': 28_000,
+    'heatmap-24h': 12_000,
+    'heatmap-7d': 12_000,
+    'matriz-equipos': 11_000,
+}
+PRESUPUESTOS_GZIP_BYTES = {
+    'alertas-data': 1_500,
+    'velocimetros-tarjetas': 6_000,
+    'velocimetros-figura': 3_800,
+    'detalle-barco': 4_200,
+    'heatmap-24h': 3_200,
+    'heatmap-7d': 3_000,
+    'matriz-equipos': 2_800,
+}
+
+
+def _propiedad(entrada):
+    """(id, prop, valor) -> dict del protocolo de Dash; una lista representa un patrón ALL."""
+    if isinstance(entrada, list):
+        return [_propiedad(e) for e in entrada]
+    return {'id': entrada[0], 'property': entrada[1], 'value': entrada[2]}
+
+
+def _llamar_callback(cliente, salidas: List, entradas: List, estado: List = (), disparador: str = '') -> Dict:
+    """POST a /_dash-update-component como lo hace el navegador; retorna bytes crudos y comprimidos."""
+    clave = '..' + '...'.join(f"{i}.{p}" for i, p in salidas) + '..' if len(salidas) > 1 else f"{salidas[0][0]}.{salidas[0][1]}"
+    # Las salidas con allow_duplicate llevan un sufijo @hash en la clave registrada
+    clave = next((c for c in app.app.callback_map if re.sub(r'@[0-9a-f]+', '', c) == clave), clave)
+    propiedades = [parte.split('.', 1)[1] for parte in clave.strip('.').split('...')]
+    cuerpo = {
+        'output': clave,
+        'outputs': ([{'id': i, 'property': p} for (i, _), p in zip(salidas, propiedades)] if len(salidas) > 1
+                    else {'id': salidas[0][0], 'property': propiedades[0]}),
+        'inputs': [_propiedad(e) for e in entradas],
+        'state': [_propiedad(e) for e in estado],
+        'changedPropIds': [disparador] if disparador else [],
+    }
+    crudo = cliente.post('/_dash-update-component', json=cuerpo)
+    comprimido = cliente.post('/_dash-update-component', json=cuerpo, headers={'Accept-Encoding': 'gzip'})
+    if crudo.status_code != 200:
+        raise RuntimeError(f"{cuerpo['output']}: HTTP {crudo.status_code}")
+    return {
+        'respuesta': crudo.get_json()['response'],
+        'bytes': len(crudo.data),
+        'bytes_comprimidos': len(comprimido.data),
+        'codificacion': comprimido.headers.get('Content-Encoding')
+    }
+
+
+def bench_presupuestos() -> List[Dict]:
+    """
+    Bytes por salida de callback sobre un dataset sintético fijo, sin
+    comprimir y con gzip, contra PRESUPUESTOS_BYTES y PRESUPUESTOS_GZIP_BYTES.
+    Usa un almacén temporal para no tocar alertas.db.
+    """
+    temporal = tempfile.mkdtemp(prefix='nirsa-bench-')
+    app.RUTA_ALERTAS_DB = os.path.join(temporal, 'alertas.db')
+    app.RUTA_HISTORICO = os.path.join(temporal, 'historico')
+    app.RUTA_CACHE_DISCO = ''
+    app.RUTA_REPORTES = os.path.join(temporal, 'reportes')
+    df_raw = generar_hoja_sintetica(FILAS_PRESUPUESTO)
+    app.cargar_datos_google_sheets = lambda: (df_raw, None)
+
+    cliente = app.server.test_client()
+    datos = _llamar_callback(
+        cliente,
+        [('alertas-data', 'data'), ('ultima-actualizacion', 'data'), ('debug-info-content', 'children')],
+        [('btn-actualizar', 'n_clicks', 1), ('interval-component', 'n_intervals', 1)],
+        [('intervalo-slider', 'value', 30), ('alertas-data', 'data', None)],
+        'btn-actualizar.n_clicks'
+    )
+    alertas_data = datos['respuesta']['alertas-data']['data']
+    medidas = {'alertas-data': datos}
+
+    highlight = {'boats': [], 'until': None, 'equipos': {}}
+    for modo in app.MODOS_VELOCIMETROS:
+        medidas[f"velocimetros-{modo}"] = _llamar_callback(
+            cliente,
+            [('velocimeters-container', 'children'), ('paginacion-velocimetros', 'max_value'), ('paginacion-contenedor', 'style')],
+            [('alertas-data', 'data', alertas_data), ('interval-component', 'n_intervals', 1),
+             ('highlight-store', 'data', highlight), ('highlight-timer', 'n_intervals', 0),
+             ('modo-velocimetros', 'value', modo), ('paginacion-velocimetros', 'active_page', 1)]
+        )
+
+    conteo = alertas_data['conteo_alertas']
+    barco = max(conteo, key=conteo.get)
+    salidas_detalle = [('sidebar-right', 'className'), ('detail-sidebar-content', 'children'),
+                       ('close-sidebar-right', 'style'), ('selected-boat', 'data'), ('sidebar-right-state', 'data'),
+                       ('sidebar-overlay', 'className'), ('app-container', 'className')]
+    tarjeta = {'type': 'barco-card', 'index': barco}
+    medidas['detalle-barco'] = _llamar_callback(
+        cliente, salidas_detalle,
+        [[(tarjeta, 'n_clicks', 1)], [], ('close-sidebar-right', 'n_clicks', None), ('sidebar-overlay', 'n_clicks', None)],
+        [('alertas-data', 'data', alertas_data), ('selected-boat', 'data', None),
+         ('sidebar-left-state', 'data', {'visible': False}), ('sidebar-right-state', 'data', {'visible': False})],
+        json.dumps(tarjeta, separators=(',', ':'), sort_keys=True) + '.n_clicks'
+    )
+
+    for ventana in app.VENTANAS_HEATMAP:
+        medidas[f"heatmap-{ventana}"] = _llamar_callback(
+            cliente, [('heatmap-horas', 'figure')],
+            [('alertas-data', 'data', alertas_data), ('heatmap-ventana', 'value', ventana)]
+        )
+    medidas['matriz-equipos'] = _llamar_callback(
+        cliente, [('matriz-equipos', 'figure'), ('matriz-equipos-alerta', 'options')],
+        [('alertas-data', 'data', alertas_data), ('matriz-equipos-alerta', 'value', None),
+         ('matriz-equipos-orden', 'value', 'total')]
+    )
+
+    return [
+        {
+            'salida': salida,
+            'bytes': m['bytes'],
+            'bytes_comprimidos': m['bytes_comprimidos'],
+            'codificacion': m['codificacion'],
+            'presupuesto': PRESUPUESTOS_BYTES[salida],
+            'presupuesto_comprimido': PRESUPUESTOS_GZIP_BYTES[salida],
+            'ok': m['bytes'] <= PRESUPUESTOS_BYTES[salida] and m['bytes_comprimidos'] <= PRESUPUESTOS_GZIP_BYTES[salida]
+        }
+        for salida, m in medidas.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del dashboard de flota")
+    parser.add_argument('benchmark', choices=['velocimetros', 'memoria', 'arranque', 'presupuestos'])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--filas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.benchmark == 'velocimetros':
+        for fila in bench_velocimetros(args.repeticiones):
+            print(fila)
+    elif args.benchmark == 'memoria':
+        print(bench_memoria(args.filas))
+    elif args.benchmark == 'arranque':
+        print(bench_arranque(args.repeticiones))
+    elif args.benchmark == 'presupuestos':
+        resultados = bench_presupuestos()
+        for fila in resultados:
+            print(fila)
+        if not all(fila['ok'] for fila in resultados):
+            sys.exit("Presupuesto de bytes excedido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""
+Punto de entrada de producción del Dashboard de Monitoreo - Flota Atunera NIRSA
+
+Uso:
+    gunicorn --preload -w 4 -b 0.0.0.0:8050 wsgi:server
+
+Con --preload el maestro descarga los datos y calcula el snapshot una sola
+vez antes de crear los workers. NIRSA_PRECARGA=0 lo desactiva.
+"""
+
+import os
+
+from app import crear_servidor
+
+server = crear_servidor(precargar=os.environ.get('NIRSA_PRECARGA', '1') != '0')